@@ -0,0 +1,284 @@
+import os
+
+# works on build boxes without a display: dummy video driver, software renderer
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_RENDER_DRIVER', 'software')
+
+import argparse
+import gc
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+import game_core
+from game_core import Game, WIDTH, HEIGHT, ExplodingShip, FIRE
+
+# frame benchmark over seeded, scripted stress scenarios. every frame is
+# timed twice, the simulation (Game.update) and the rendering (render.draw
+# plus the display flip), and the percentiles are written as JSON so two
+# revisions can be compared:
+#
+#   python benchmark.py --out before.json
+#   python benchmark.py --out after.json --compare before.json
+
+SCENARIOS = {}
+
+def scenario(name):
+    # a scenario sets up the game and returns a function giving the held
+    # keys for each frame, it may poke the game to keep the stress going
+    def register(setup):
+        SCENARIOS[name] = setup
+        return setup
+    return register
+
+def keep_alive(game):
+    # the ship must not run out of lives in the middle of a measurement
+    game.lives.lives = game.initial_lives
+
+def crowd(game, count):
+    # count asteroids all the time, with the ship firing and turning
+    game.level = 10
+    game.asteroids.clear()
+
+    def fill():
+        while len(game.asteroids) < count:
+            size = random.choice(['big', 'medium', 'small'])
+            game.asteroids.spawn(random.randrange(WIDTH), random.randrange(HEIGHT), 3.0, size)
+    fill()
+
+    def tick(frame):
+        keep_alive(game)
+        fill()
+        game.fire()
+        return { 'left': True }
+    return tick
+
+@scenario('level10')
+def level10(game):
+    return crowd(game, 300)
+
+@scenario('swarm')
+def swarm(game):
+    # far more than any level has, for how the collision checks scale
+    return crowd(game, 2000)
+
+@scenario('bullets')
+def bullets(game):
+    def tick(frame):
+        keep_alive(game)
+        for _ in game.bullets:
+            game.fire()
+        return { 'left': frame % 200 < 100, 'right': frame % 200 >= 100 }
+    return tick
+
+@scenario('debris')
+def debris(game):
+    def tick(frame):
+        keep_alive(game)
+        if frame % 10 == 0:
+            for _ in range(20):
+                ast = game.asteroids.spawn(random.randrange(WIDTH), random.randrange(HEIGHT), 1.0, 'small')
+                ast.explode(game.particles)
+                game.asteroids.kill(ast)
+        return {}
+    return tick
+
+@scenario('ufo_ship')
+def ufo_ship(game):
+    def tick(frame):
+        keep_alive(game)
+        ufo = game.ufo
+        if not ufo.in_flight:
+            ufo.next_appearance = 0
+        elif frame % 60 == 0:
+            ufo.explode(game.particles)
+        if frame % 120 == 0 and not game.exploding_ship:
+            game.exploding_ship = ExplodingShip(game.ship, game.particles)
+        return { 'thrust': True, 'left': True }
+    return tick
+
+
+def setup_renderer(dirty=False, render_scale=1.0):
+    import pygame
+    import pgzero.game
+    import pgzero.loaders
+    from sprite_cache import CachedActor
+
+    pygame.init()
+    surface = pygame.display.set_mode((WIDTH, HEIGHT))
+    pgzero.loaders.set_root(os.path.abspath(__file__))
+    pgzero.game.screen = surface
+    game_core.Actor = CachedActor
+    import render
+
+    if dirty:
+        from dirty_rects import DirtyRects
+        render.dirty = DirtyRects()
+        present = render.dirty.present
+    else:
+        render.dirty = None
+        present = pygame.display.flip
+    render.set_render_scale(render_scale)
+
+    def render_frame(game):
+        render.draw(game, surface)
+        present()
+    return render_frame
+
+def percentiles(samples):
+    # milliseconds
+    if not samples:
+        return None
+    samples = sorted(samples)
+    def at(p):
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+    return {
+        'mean': sum(samples) / len(samples) * 1000,
+        'p50': at(50),
+        'p90': at(90),
+        'p99': at(99),
+        'max': samples[-1] * 1000,
+    }
+
+def run(name, frames, seed, engine, render_frame=None):
+    random.seed(seed)
+    game = Game(engine=engine, seed=seed)
+    tick = SCENARIOS[name](game)
+    sim_times = []
+    render_times = []
+    for frame in range(frames):
+        held = tick(frame)
+        start = time.perf_counter()
+        game.update(**held)
+        sim_times.append(time.perf_counter() - start)
+        if render_frame:
+            start = time.perf_counter()
+            render_frame(game)
+            render_times.append(time.perf_counter() - start)
+    return {
+        'sim': percentiles(sim_times),
+        'render': percentiles(render_times),
+        'entities': {
+            'asteroids': len(game.asteroids),
+            'particles': game.particles.count(),
+            'bullets': sum(b.bullet_in_flight for b in game.bullets),
+        },
+    }
+
+def allocations(action):
+    # the objects tracked by the gc that action() made and kept, how many
+    # more memory blocks are in use after it and how long it took. holding
+    # on to the old objects keeps their ids from being reused
+    gc.collect()
+    old = gc.get_objects()
+    ids = set(map(id, old))
+    ids.update((id(old), id(ids)))
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    action()
+    seconds = time.perf_counter() - start
+    blocks = sys.getallocatedblocks() - blocks
+    made = []
+    ids.add(id(made))
+    for obj in gc.get_objects():
+        if id(obj) not in ids:
+            made.append(obj)
+    return made, blocks, seconds
+
+def restarts(count, seed, engine, render_frame=None):
+    # what Game.init() allocates after a game over. a bit of a game is
+    # played before every restart, so there is something to start over from
+    random.seed(seed)
+    game = Game(engine=engine, seed=seed)
+    times = []
+    objects = []
+    blocks = []
+    kinds = Counter()
+    for _ in range(count):
+        for frame in range(300):
+            if frame % 7 == 0:
+                game.key_events(FIRE)
+            game.update(thrust=random.random() < 0.3, left=random.random() < 0.2, right=False)
+            if render_frame:
+                render_frame(game)
+        game.over()
+        made, more, seconds = allocations(game.init)
+        times.append(seconds)
+        blocks.append(more)
+        objects.append(len(made))
+        kinds.update(type(obj).__name__ for obj in made)
+        del made
+    return {
+        'init': percentiles(times),
+        'new_objects': sum(objects) / count,
+        'new_blocks': sum(blocks) / count,
+        'new_object_types': dict(kinds.most_common(8)),
+    }
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def compare(results, old):
+    for name, res in results['scenarios'].items():
+        before = old['scenarios'].get(name)
+        if not before:
+            continue
+        for phase in ('sim', 'render'):
+            if res[phase] and before[phase]:
+                ratios = '  '.join(f"{p} {res[phase][p] / before[phase][p]:.2f}x"
+                                   for p in ('p50', 'p99') if before[phase][p])
+                print(f"{name:10} {phase:6} vs {old.get('revision')}: {ratios}")
+
+def main():
+    parser = argparse.ArgumentParser(description='frame timing over stress scenarios')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help=', '.join(SCENARIOS))
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--no-render', action='store_true', help='time the simulation only, no pygame')
+    parser.add_argument('--dirty', action='store_true', help='render with dirty rectangles')
+    parser.add_argument('--render-scale', type=float, default=1.0, help='internal resolution relative to the window')
+    parser.add_argument('--restarts', type=int, default=0, help='also count what this many restarts allocate')
+    parser.add_argument('--out', default='benchmark.json')
+    parser.add_argument('--compare', help='earlier results to compare against')
+    args = parser.parse_args()
+
+    render_frame = None if args.no_render else setup_renderer(args.dirty, args.render_scale)
+    results = {
+        'revision': revision(),
+        'engine': args.engine,
+        'frames': args.frames,
+        'seed': args.seed,
+        'video_driver': os.environ['SDL_VIDEODRIVER'],
+        'render_driver': os.environ['SDL_RENDER_DRIVER'],
+        'dirty_rects': args.dirty,
+        'render_scale': args.render_scale,
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        res = run(name, args.frames, args.seed, args.engine, render_frame)
+        results['scenarios'][name] = res
+        line = f"{name:10} sim p50 {res['sim']['p50']:6.2f}ms p99 {res['sim']['p99']:6.2f}ms"
+        if res['render']:
+            line += f"  render p50 {res['render']['p50']:6.2f}ms p99 {res['render']['p99']:6.2f}ms"
+        print(line)
+    if args.restarts:
+        res = results['restarts'] = restarts(args.restarts, args.seed, args.engine, render_frame)
+        print(f"restart    init p50 {res['init']['p50']:6.2f}ms  {res['new_objects']:.1f} new objects, "
+              f"{res['new_blocks']:+.1f} memory blocks per restart")
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
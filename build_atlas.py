@@ -0,0 +1,74 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import pygame
+from pgzero import loaders
+import sprite_cache
+from sprite_cache import SpriteCache, SPRITES, ATLAS
+
+# build step for the sprite atlas: every sprite of sprite_cache.SPRITES at
+# its scale, and at each quantized rotation for the ship, packed into one raw
+# BGRA file, the pixel layout of a 32 bit display, plus a JSON index. SpriteCache.load_atlas() reads it at startup
+# instead of decoding and transforming the PNGs.
+#
+#   python build_atlas.py
+#   python build_atlas.py --render-scale 0.5     # for ASTEROIDS_RENDER_SCALE=0.5
+
+ATLAS_WIDTH = 4096
+
+
+def frames(cache, render_scale):
+    for image, scale, turns in SPRITES:
+        scale = scale * render_scale
+        for step in range(cache.steps if turns else 1):
+            angle = cache.quantize(step * 360 / cache.steps)
+            yield (image, scale, angle), cache.get(image, scale, angle)
+
+def pack(sizes, width=ATLAS_WIDTH):
+    # shelf packing, tallest first. returns the positions and the atlas height
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x = 0
+            y += shelf
+            shelf = 0
+        positions[i] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+def main():
+    parser = argparse.ArgumentParser(description='pack the sprites into one atlas file')
+    parser.add_argument('--out', default=ATLAS)
+    parser.add_argument('--steps', type=int, default=sprite_cache.ROTATION_STEPS, help='rotations of the ship')
+    parser.add_argument('--render-scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    loaders.set_root(os.path.abspath(__file__))
+
+    cache = SpriteCache(args.steps)
+    keys, surfaces = zip(*frames(cache, args.render_scale))
+    positions, height = pack([ s.get_size() for s in surfaces ])
+    atlas = pygame.Surface((ATLAS_WIDTH, height), pygame.SRCALPHA)
+    index = { 'size': [ATLAS_WIDTH, height], 'format': 'BGRA', 'steps': args.steps, 'frames': [] }
+    for (image, scale, angle), surface, (x, y) in zip(keys, surfaces, positions):
+        # a plain copy, alpha blending onto the transparent atlas would darken edges
+        atlas.blit(surface, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        index['frames'].append([image, scale, angle, x, y, *surface.get_size()])
+
+    with open(args.out, 'wb') as f:
+        f.write(pygame.image.tobytes(atlas, index['format']))
+    with open(args.out + '.json', 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    print(f"{len(surfaces)} frames, {ATLAS_WIDTH}x{height} -> {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import pygame
+from sprite_cache import sprites
+from game_core import clip_segment
+
+# pixel exact collisions for t.py. game_core tests bounding rects, which
+# for the ship and the ufo hit a lot of empty corners. here a rect hit is
+# confirmed against the sprite masks, made once per (image, scale, quantized
+# angle) like the surfaces in sprite_cache and shared by all actors.
+
+masks = {}
+
+def mask(actor):
+    key = (actor.image, actor.scale, sprites.quantize(actor.angle))
+    m = masks.get(key)
+    if m is None:
+        m = masks[key] = pygame.mask.from_surface(sprites.get(*key))
+    return m
+
+def segment_hit(actor, x0, y0, x1, y1):
+    span = clip_segment(actor, x0, y0, x1, y1)
+    if span is None:
+        return None
+    # walk the part inside the rect a pixel at a time
+    t0, t1 = span
+    dx = x1 - x0
+    dy = y1 - y0
+    steps = int(max(abs(dx), abs(dy)) * (t1 - t0)) + 1
+    m = mask(actor)
+    w, h = m.get_size()
+    left = actor.left
+    top = actor.top
+    for i in range(steps + 1):
+        t = t0 + (t1 - t0) * i / steps
+        px = int(x0 + dx * t - left)
+        py = int(y0 + dy * t - top)
+        if 0 <= px < w and 0 <= py < h and m.get_at((px, py)):
+            return t
+    return None
+
+def actors_hit(a, b):
+    if not a.colliderect(b):
+        return False
+    offset = (int(b.left) - int(a.left), int(b.top) - int(a.top))
+    return mask(a).overlap(mask(b), offset) is not None
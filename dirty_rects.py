@@ -0,0 +1,54 @@
+import pygame
+
+# t.py may point pygame.display.flip at present(), keep the real one
+flip = pygame.display.flip
+
+# dirty rectangle bookkeeping for render.draw(). instead of clearing the
+# whole 2500x2000 screen, only the rects drawn in the previous frame are
+# erased, and only those plus the rects drawn in this frame are pushed to
+# the display. a busy frame with more than max_rects rects falls back to a
+# full clear and flip, which is cheaper than hundreds of small updates.
+
+
+class DirtyRects:
+    def __init__(self, max_rects=150):
+        self.max_rects = max_rects
+        self.previous = []
+        self.current = []
+        self.changed = []
+        self.full = True
+        # the frame was drawn off-screen and scaled into the whole window
+        self.whole_window = False
+
+    def begin(self, surface):
+        if self.full or len(self.previous) > self.max_rects:
+            self.full = True
+            surface.fill((0, 0, 0))
+        else:
+            for rect in self.previous:
+                surface.fill((0, 0, 0), rect)
+
+    def add(self, rect):
+        self.current.append(rect)
+
+    def end(self, whole_window=False):
+        if len(self.current) > self.max_rects:
+            self.full = True
+        self.whole_window = whole_window
+        self.changed.extend(self.previous)
+        self.changed.extend(self.current)
+        self.previous = self.current
+        self.current = []
+
+    def invalidate(self):
+        # next frame repaints and pushes the whole screen
+        self.full = True
+
+    def present(self):
+        if self.full or self.whole_window:
+            flip()
+            self.full = False
+        elif self.changed:
+            pygame.display.update(self.changed)
+        self.changed = []
+
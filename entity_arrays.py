@@ -0,0 +1,189 @@
+import numpy as np
+from game_core import Asteroid, Bullet, near_edges, WIDTH, HEIGHT
+
+# structure-of-arrays storage for asteroids and bullets. every entity owns a
+# slot, the game objects keep their usual attributes but read and write them
+# through ArrayField descriptors, so drawing and collision code is unchanged
+# while the per-frame movement runs as a handful of numpy operations.
+# actors are only moved to their entity's position when they are asked for,
+# and the grid is updated from the columns, so a tick does no per entity
+# work in python for the ones that stay in their cells.
+
+SIZES = ['big', 'medium', 'small']
+
+
+class EntityArrays:
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.owners = []
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        # position before the last move()
+        self.px = np.zeros(capacity)
+        self.py = np.zeros(capacity)
+        self.angle = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int8)
+        self.in_flight = np.zeros(capacity, dtype=bool)
+        # half the size of the actor, and the cells it was last put in the
+        # grid with as one number, -1 for none
+        self.half_w = np.zeros(capacity)
+        self.half_h = np.zeros(capacity)
+        self.cells = np.full(capacity, -1)
+
+    def add(self, owner):
+        if self.count == len(self.x):
+            self._grow()
+        slot = self.count
+        self.count += 1
+        self.owners.append(owner)
+        return slot
+
+    def _grow(self):
+        capacity = len(self.x) * 2
+        for name in ('x', 'y', 'px', 'py', 'angle', 'speed', 'size', 'in_flight', 'half_w', 'half_h', 'cells'):
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name == 'cells' else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def move(self):
+        # same math as directional_movement() followed by
+        #   x += bdx * speed ; y -= bdy * speed
+        # for every entity in flight
+        n = self.count
+        live = self.in_flight[:n]
+        tangle = np.radians(self.angle[:n] + 90.0)
+        step = np.where(live, self.speed[:n], 0.0)
+        np.copyto(self.px[:n], self.x[:n], where=live)
+        np.copyto(self.py[:n], self.y[:n], where=live)
+        self.x[:n] += np.cos(tangle) * step
+        self.y[:n] -= np.sin(tangle) * step
+
+    def outside(self, left, top, right, bottom, live_only=False):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        out = (x < left) | (x > right) | (y < top) | (y > bottom)
+        if live_only:
+            out &= self.in_flight[:n]
+        return np.flatnonzero(out)
+
+    def update_grid(self, grid, solid=False):
+        # puts the entities in flight that moved into other cells back into
+        # the grid, the cells of all of them worked out at once
+        n = self.count
+        size = grid.cell_size
+        x = self.x[:n]
+        y = self.y[:n]
+        col0 = np.clip((x - self.half_w[:n]) // size, 0, grid.cols - 1)
+        col1 = np.clip((x + self.half_w[:n]) // size, 0, grid.cols - 1)
+        row0 = np.clip((y - self.half_h[:n]) // size, 0, grid.rows - 1)
+        row1 = np.clip((y + self.half_h[:n]) // size, 0, grid.rows - 1)
+        cells = (((row0 * grid.rows + row1) * grid.cols + col0) * grid.cols + col1).astype(self.cells.dtype)
+        moved = np.flatnonzero((cells != self.cells[:n]) & self.in_flight[:n])
+        self.cells[:n] = cells
+        owners = self.owners
+        for slot in moved.tolist():
+            owner = owners[slot]
+            grid.insert(owner, owner.actor, solid)
+
+    def forget_cells(self):
+        # after the grid was rebuilt, the next update_grid() looks at all
+        self.cells[:] = -1
+
+
+class ArrayField:
+    # attribute stored in the EntityArrays of the owning object
+    def __init__(self, column, encode=None, decode=None):
+        self.column = column
+        self.encode = encode
+        self.decode = decode
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj.arrays, self.column)[obj.slot].item()
+        if self.decode:
+            value = self.decode(value)
+        return value
+
+    def __set__(self, obj, value):
+        if self.encode:
+            value = self.encode(value)
+        getattr(obj.arrays, self.column)[obj.slot] = value
+
+
+def size_field():
+    return ArrayField('size', encode=SIZES.index, decode=SIZES.__getitem__)
+
+
+class ArrayActor:
+    # the actor of an entity, put at the entity's position in the arrays
+    # whenever it is asked for, to be drawn or collision tested
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        actor = obj._actor
+        arrays = obj.arrays
+        actor.center = (arrays.x[obj.slot].item(), arrays.y[obj.slot].item())
+        return actor
+
+    def __set__(self, obj, actor):
+        obj._actor = actor
+        # asteroids never turn, their size is known from here on
+        obj.arrays.half_w[obj.slot] = actor.width / 2
+        obj.arrays.half_h[obj.slot] = actor.height / 2
+
+
+# array backed versions of the game objects, used by Game(engine='numpy')
+
+
+class ArrayBullet(Bullet):
+    bullet_in_flight = ArrayField('in_flight')
+    bullet_x = ArrayField('x')
+    bullet_y = ArrayField('y')
+    bullet_angle = ArrayField('angle')
+    bullet_speed = ArrayField('speed')
+    prev_x = ArrayField('px')
+    prev_y = ArrayField('py')
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.slot = arrays.add(self)
+        super().__init__()
+
+
+class ArrayAsteroid(Asteroid):
+    asteroid_in_flight = ArrayField('in_flight')
+    asteroid_x = ArrayField('x')
+    asteroid_y = ArrayField('y')
+    asteroid_angle = ArrayField('angle')
+    speed = ArrayField('speed')
+    size = size_field()
+    actor = ArrayActor()
+
+    def __init__(self, arrays, *args, **kwargs):
+        self.arrays = arrays
+        self.slot = arrays.add(self)
+        super().__init__(*args, **kwargs)
+        # with the scale set
+        self.actor = self._actor
+
+    def reset(self, init_x, init_y, speed):
+        super().reset(init_x, init_y, speed)
+        # handed out again, maybe in other cells than it was last in
+        self.arrays.cells[self.slot] = -1
+
+
+def update_arrays(game):
+    bullets = game.bullet_arrays
+    bullets.move()
+    bullets.in_flight[bullets.outside(0, 0, WIDTH, HEIGHT)] = False
+
+    asteroids = game.asteroid_arrays
+    asteroids.move()
+    for slot in asteroids.outside(-200, -200, WIDTH + 200, HEIGHT + 200, live_only=True):
+        # respawn
+        ast = asteroids.owners[slot]
+        ast.asteroid_x, ast.asteroid_y, ast.asteroid_angle = near_edges(game.rng)
@@ -0,0 +1,192 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import multiprocessing as mp
+import queue
+import shutil
+import struct
+import subprocess
+import time
+import zlib
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from game_core import Game, RESTART, WIDTH, HEIGHT
+from journal import read_journal, held_keys
+import replay
+
+# renders a recorded session (journal.py) to a video without a window, as
+# fast as the frames can be drawn:
+#
+#   python export_video.py session.journal attract.mp4
+#   python export_video.py session.journal highlight.png --start 1200 --stop 1800
+#
+# one frame per tick. the frames are drawn straight into the slots of a
+# shared memory ring and handed to an encoder process by slot number, which
+# pipes them to ffmpeg, or for .png writes an animated PNG itself. when
+# every slot is waiting to be encoded the renderer blocks until one is free,
+# so a slow encoder holds it back instead of piling up frames.
+
+
+def chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class ApngWriter:
+    # animated PNG, RGB, every frame the full size and shown for one tick
+    def __init__(self, path, size, fps, level=6):
+        self.file = open(path, 'wb')
+        self.size = size
+        self.fps = fps
+        self.level = level
+        self.frames = 0
+        self.sequence = 0
+        width, height = size
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        # the number of frames is filled in by close()
+        self.actl = self.file.tell()
+        self.file.write(chunk(b'acTL', struct.pack('>II', 0, 0)))
+        # every row starts with its filter type, 0
+        self.rows = np.zeros((height, 1 + width * 3), np.uint8)
+
+    def frame(self, pixels):
+        width, height = self.size
+        bgra = np.frombuffer(pixels, np.uint8).reshape(height, width, 4)
+        self.rows[:, 1:].reshape(height, width, 3)[:] = bgra[:, :, 2::-1]
+        data = zlib.compress(self.rows, self.level)
+        self.file.write(chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.sequence, width, height, 0, 0, 1, self.fps, 0, 0)))
+        self.sequence += 1
+        if self.frames == 0:
+            self.file.write(chunk(b'IDAT', data))
+        else:
+            self.file.write(chunk(b'fdAT', struct.pack('>I', self.sequence) + data))
+            self.sequence += 1
+        self.frames += 1
+
+    def close(self):
+        self.file.write(chunk(b'IEND', b''))
+        self.file.seek(self.actl)
+        self.file.write(chunk(b'acTL', struct.pack('>II', self.frames, 0)))
+        self.file.close()
+
+
+class FfmpegWriter:
+    def __init__(self, path, size, fps):
+        width, height = size
+        self.process = subprocess.Popen(
+            [ 'ffmpeg', '-loglevel', 'error', '-y',
+              '-f', 'rawvideo', '-pix_fmt', 'bgra', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+              # yuv420p wants even sizes
+              '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', path ],
+            stdin=subprocess.PIPE)
+
+    def frame(self, pixels):
+        self.process.stdin.write(pixels)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError(f"ffmpeg failed with exit code {self.process.returncode}")
+
+
+def encoder(name, size, path, fps, full, free):
+    memory = SharedMemory(name)
+    frame_bytes = size[0] * size[1] * 4
+    if path.endswith('.png'):
+        writer = ApngWriter(path, size, fps)
+    else:
+        writer = FfmpegWriter(path, size, fps)
+    while True:
+        slot = full.get()
+        if slot is None:
+            break
+        pixels = memory.buf[slot * frame_bytes:(slot + 1) * frame_bytes]
+        writer.frame(pixels)
+        pixels.release()
+        free.put(slot)
+    writer.close()
+    memory.close()
+
+def free_slot(free, process):
+    while True:
+        try:
+            return free.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError("the encoder process stopped")
+
+def export(path, out, start=0, stop=None, fps=60, scale=0.5, slots=4, engine='python'):
+    if not out.endswith('.png') and not shutil.which('ffmpeg'):
+        raise SystemExit("no ffmpeg found, export to a .png (animated PNG) instead")
+    header, ticks = read_journal(path)
+    size = (int(WIDTH * scale), int(HEIGHT * scale))
+    frame_bytes = size[0] * size[1] * 4
+    memory = SharedMemory(create=True, size=frame_bytes * slots)
+    full = mp.Queue()
+    free = mp.Queue()
+    for slot in range(slots):
+        free.put(slot)
+    # started before pygame is, it needs none of it
+    process = mp.Process(target=encoder, args=(memory.name, size, out, fps, full, free), daemon=True)
+    process.start()
+
+    replay.setup(header, True)
+    import pygame
+    import render
+    render.set_render_scale(scale)
+    # the slots as surfaces, draw() renders into shared memory directly
+    views = [ memory.buf[slot * frame_bytes:(slot + 1) * frame_bytes] for slot in range(slots) ]
+    surfaces = [ pygame.image.frombuffer(view, size, 'BGRA') for view in views ]
+
+    game = Game(engine=engine, seed=header['seed'])
+    tick = 0
+    frames = 0
+    try:
+        for i in range(0, len(ticks), 2):
+            if stop is not None and tick >= stop:
+                break
+            held, events = ticks[i], ticks[i + 1]
+            if events & RESTART:
+                game.init()
+                continue
+            game.key_events(events)
+            game.update(*held_keys(held))
+            if tick >= start:
+                slot = free_slot(free, process)
+                render.draw(game, surfaces[slot])
+                full.put(slot)
+                frames += 1
+            tick += 1
+    finally:
+        full.put(None)
+        process.join()
+        del surfaces
+        for view in views:
+            view.release()
+        memory.close()
+        memory.unlink()
+    if process.exitcode:
+        raise RuntimeError(f"the encoder process failed with exit code {process.exitcode}")
+    return frames
+
+def main():
+    parser = argparse.ArgumentParser(description='render an input journal to a video')
+    parser.add_argument('journal')
+    parser.add_argument('out', help='.png for an animated PNG, anything else is encoded by ffmpeg')
+    parser.add_argument('--start', type=int, default=0, help='first tick to render')
+    parser.add_argument('--stop', type=int, default=None, help='tick to stop at')
+    parser.add_argument('--fps', type=int, default=60)
+    parser.add_argument('--scale', type=float, default=0.5, help='of the 2500x2000 playfield')
+    parser.add_argument('--slots', type=int, default=4, help='frames in flight between renderer and encoder')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frames = export(args.journal, args.out, args.start, args.stop, args.fps, args.scale, args.slots, args.engine)
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames, {elapsed:.2f}s, {frames / elapsed:.1f} frames/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# the game's speeds and timers are all per tick: bullets move 12 pixels, the
+# ufo shoots every 200-500 ticks, tuned for 60 ticks a second, so any other
+# rate plays the game faster or slower and t.py only runs 60. FixedStep runs
+# the simulation at that tick rate whatever the frame rate is, a slow frame
+# is followed by up to max_ticks ticks to catch up, and draw() places the
+# moving things between their last two ticks so motion stays smooth when
+# frames and ticks don't line up.
+
+# a move longer than this between two ticks is a wrap around the screen or
+# a respawn, and is not interpolated
+MAX_JUMP = 200
+
+
+class FixedStep:
+    def __init__(self, rate=60, max_ticks=4):
+        self.tick = 1.0 / rate
+        self.max_ticks = max_ticks
+        # time not yet simulated, less than one tick after advance()
+        self.pending = 0.0
+        self.previous = {}
+
+    def advance(self, dt):
+        # number of ticks to run for dt seconds of real time. when more than
+        # max_ticks are due the rest is dropped: the game slows down instead
+        # of falling further and further behind
+        self.pending += dt
+        ticks = int(self.pending / self.tick)
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+            self.pending = 0.0
+        else:
+            self.pending -= ticks * self.tick
+        return ticks
+
+    @property
+    def alpha(self):
+        # how far the frame is between the last tick and the next, 0..1
+        return min(self.pending / self.tick, 1.0)
+
+    def capture(self, game):
+        # positions before the last tick of a frame, what draw() blends from
+        previous = {}
+        for actor in [ game.ship.actor, game.ufo.ufo ] + [ ast.actor for ast in game.asteroids ]:
+            previous[id(actor)] = (actor.x, actor.y, actor.angle)
+        for bull in game.bullets + [ game.ufo.bullet ]:
+            if bull.bullet_in_flight:
+                previous[id(bull)] = (bull.bullet_x, bull.bullet_y, 0)
+        self.previous = previous
+
+    def at(self, obj, x, y, angle=0):
+        # position and angle to draw obj at, given where it is now
+        before = self.previous.get(id(obj))
+        if before is None:
+            return x, y, angle
+        px, py, pangle = before
+        if abs(x - px) > MAX_JUMP or abs(y - py) > MAX_JUMP:
+            return x, y, angle
+        # frames are drawn up to one tick behind the simulation
+        a = self.alpha
+        return px + (x - px) * a, py + (y - py) * a, pangle + (angle - pangle) * a
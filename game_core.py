@@ -0,0 +1,889 @@
+from math import sin, cos, radians, sqrt, ceil
+import random
+from random import Random
+import game_state
+from functools import partial
+from spatial_hash import SpatialHash
+from particles import Particles
+from leaderboard import Leaderboard
+
+# the game logic without any pgzero, pygame or display dependency. t.py
+# runs it in a window with real Actors, headless.py runs it without one.
+
+WIDTH = 2500
+HEIGHT = 2000
+
+# size of the images in images/, so hitboxes can be computed without loading them
+IMAGE_SIZES = {
+    'asteroid-a': (268, 259),
+    'asteroid-b': (256, 253),
+    'asteroid-c': (260, 250),
+    'ship': (37, 36),
+    'ship-flame': (37, 36),
+    'ufo': (45, 29),
+}
+
+
+class Box:
+    # stand-in for an Actor when there is no display: a rect with the size
+    # of the scaled and rotated sprite, plain float geometry, no surfaces
+    def __init__(self, image, pos=None, center=None):
+        self._image = image
+        self._scale = 1.0
+        self._angle = 0.0
+        self.x, self.y = center or pos or (0, 0)
+        self._resize()
+
+    def _resize(self):
+        # whole pixels, like the surfaces an Actor would get
+        w, h = IMAGE_SIZES[self._image]
+        w = int(w * self._scale)
+        h = int(h * self._scale)
+        if self._angle:
+            a = radians(self._angle)
+            w, h = ceil(abs(w * cos(a)) + abs(h * sin(a))), ceil(abs(w * sin(a)) + abs(h * cos(a)))
+        self.width = w
+        self.height = h
+
+    @property
+    def image(self):
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+        self._resize()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, scale):
+        self._scale = scale
+        self._resize()
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle):
+        if angle != self._angle:
+            self._angle = angle
+            self._resize()
+
+    @property
+    def center(self):
+        return self.x, self.y
+
+    @center.setter
+    def center(self, center):
+        self.x, self.y = center
+
+    pos = center
+
+    @property
+    def left(self):
+        return self.x - self.width / 2
+
+    @left.setter
+    def left(self, left):
+        self.x = left + self.width / 2
+
+    @property
+    def right(self):
+        return self.x + self.width / 2
+
+    @right.setter
+    def right(self, right):
+        self.x = right - self.width / 2
+
+    @property
+    def top(self):
+        return self.y - self.height / 2
+
+    @top.setter
+    def top(self, top):
+        self.y = top + self.height / 2
+
+    @property
+    def bottom(self):
+        return self.y + self.height / 2
+
+    @bottom.setter
+    def bottom(self, bottom):
+        self.y = bottom - self.height / 2
+
+    def collidepoint(self, x, y):
+        return self.left <= x < self.right and self.top <= y < self.bottom
+
+    def colliderect(self, other):
+        return (self.left < other.right and other.left < self.right and
+                self.top < other.bottom and other.top < self.bottom)
+
+    def draw(self):
+        pass
+
+# t.py replaces this with pgzero's Actor before creating a Game
+Actor = Box
+
+
+def near_edges(rng=random):
+    side = rng.choice(['north', 'south', 'east', 'west'])
+    # angle 0 = up
+    # angle -90 = right
+    # angle 90 = left
+    # angle 180 = down
+    if side == 'south':
+        angle = rng.randrange(-70, 70)
+        x = rng.randrange(WIDTH // 4, WIDTH * 3 // 4)
+        y = HEIGHT + 100
+    elif side == 'north':
+        angle = rng.randrange(90 + 45, 180 + 45)
+        x = rng.randrange(WIDTH // 4, WIDTH * 3 // 4)
+        y = -100
+    elif side == 'east':
+        angle = rng.randrange(45, 180 - 45)
+        x = WIDTH + 100
+        y = rng.randrange(HEIGHT // 4, HEIGHT * 3 // 4)
+    elif side == 'west':
+        angle = rng.randrange(-180 + 45, -45)
+        x = -100
+        y = rng.randrange(HEIGHT // 4, HEIGHT * 3 // 4)
+    return (x, y, angle)
+
+# key events for Game.key_events(), one bit each
+ROTATE_LEFT = 1
+ROTATE_RIGHT = 2
+THRUST_ON = 4
+THRUST_OFF = 8
+TELEPORT = 16
+FIRE = 32
+# not a key of the game itself: game over screen dismissed, Game.init()
+RESTART = 64
+
+def empty_highscores():
+    return [{'initials':'', 'score':0}] * 10
+
+class Game:
+    def __init__(self, highscores=None, engine='python', seed=None):
+        # engine 'python' updates asteroids and bullets one object at a time,
+        # 'numpy' keeps them in arrays and moves them all at once (entity_arrays.py)
+        self.engine = engine
+        # every random number of the game comes from here, so a seed and the
+        # inputs of each tick replay a game exactly (journal.py)
+        self.seed = seed
+        self.rng = Random(seed)
+        self.initial_lives = 4
+        self.nr_asteroids = { 0: 3, 1: 4, 2:5 }
+        self.speed = { 0: 1.0, 1:1.5, 2:2.0 }
+        self.initials = ""
+        if not isinstance(highscores, Leaderboard):
+            highscores = Leaderboard(highscores if highscores is not None else empty_highscores())
+        self.highscores = highscores
+        # 20 points for a large asteroid, 50 for a medium, and 100 for a small one. Flying saucers award higher points: 200 for a large saucer and 1,000 for a small one. A bonus ship is also awarded for every 10,000
+        self.scores = {
+            'big': 20,
+            'medium': 50,
+            'small': 100,
+            'ufo':200,
+            'small-ufo':1000,
+        }
+        self.extra_life = 10000
+
+        # top, left coord or score
+        self.score_x = 200
+        self.score_y = 10
+        self.lives_x = self.score_x + 50
+        self.lives_y = self.score_y + 180
+
+        # broad-phase for the collision checks, kept up to date by the
+        # asteroid pool and update_grid()
+        self.grid = SpatialHash(WIDTH, HEIGHT)
+        # (bullet, Path) of the ship's bullets in flight, made with the grid
+        self.paths = []
+        # debris of every explosion
+        self.particles = Particles()
+        # a profiler.Profiler to time the phases of update(), None when off
+        self.profiler = None
+
+        self.ship = Ship(self.rng)
+        if self.engine == 'numpy':
+            from entity_arrays import EntityArrays, ArrayBullet, ArrayAsteroid, update_arrays
+            self.update_arrays = update_arrays
+            self.bullet_arrays = EntityArrays(10)
+            self.asteroid_arrays = EntityArrays(32)
+            self.bullets = [ ArrayBullet(self.bullet_arrays) for _ in range(10) ]
+            self.asteroids = AsteroidPool(partial(ArrayAsteroid, self.asteroid_arrays, rng=self.rng), self.grid)
+        else:
+            self.bullets = [ Bullet() for _ in range(10) ]
+            self.asteroids = AsteroidPool(partial(Asteroid, rng=self.rng), self.grid)
+        self.lives = Lives(self)
+        self.ufo = Ufo(self.rng)
+        # games started with init(), the first one included
+        self.restarts = 0
+        self.init()
+
+    def init(self):
+        # a new game. the objects of the last one are reset in place, a
+        # restart makes no new Actors, bullets or asteroids
+        self.restarts += 1
+        self.level = 0
+        self.rotate_speed = 0
+        if self.restarts > 1:
+            # in the order they were first made in, they take random numbers
+            self.ship.reset()
+            for bull in self.bullets:
+                bull.reset()
+            self.lives.reset(self)
+            self.ufo.reset()
+        self.exploding_ship = None
+        self.particles.clear()
+        self.score = 0
+        self.prev_score = 0
+        self.game_over = False
+        self.get_highscore = False
+        self.show_highscore = False
+        self.restart = False
+        self.init_asteroids()
+
+    def snapshot(self, into=None):
+        # the simulation state, to go back to with restore(). into is an
+        # earlier snapshot to reuse (game_state.py)
+        return game_state.snapshot(self, into)
+
+    def restore(self, snap):
+        game_state.restore(self, snap)
+        build_grid(self)
+
+    def over(self):
+        self.game_over = True
+        if self.highscores.qualifies(self.score):
+            self.get_highscore = True
+        else:
+            self.show_highscore = True
+
+    def init_asteroids(self):
+        self.asteroids.clear()
+        for _ in range(self.nr_asteroids.get(self.level, 7)):
+            self.asteroids.spawn(-300, -300, self.speed.get(self.level,3.0))
+
+    def level_update(self):
+        if not self.asteroids:
+            self.level += 1
+            print("level up",self.level)
+            self.init_asteroids()
+
+    def score_update(self):
+        if (self.score // self.extra_life - self.prev_score // self.extra_life) > 0:
+            self.lives.lives += 1
+        self.prev_score = self.score
+
+    def fire(self):
+        for bull in self.bullets:
+            if not bull.bullet_in_flight:
+                bull.bullet_in_flight = True
+                bull.bullet_x = bull.prev_x = self.ship.x
+                bull.bullet_y = bull.prev_y = self.ship.y
+                bull.bullet_angle = self.ship.angle
+                bull.bullet_speed = 12
+                break
+
+    def key_events(self, events):
+        # the key presses of one tick, a mask of the bits defined above. they
+        # are applied in bit order, so a recorded tick replays the same way.
+        # after game over only letting go of thrust still does something
+        playing = not self.game_over
+        if playing and events & ROTATE_LEFT:
+            self.rotate_speed += 0.4
+        if playing and events & ROTATE_RIGHT:
+            self.rotate_speed -= 0.4
+        if playing and events & THRUST_ON:
+            self.ship.thrust()
+        if events & THRUST_OFF:
+            self.ship.thrust_off()
+        if playing and events & TELEPORT:
+            self.ship.teleport(self)
+        if playing and events & FIRE:
+            self.fire()
+
+    def update(self, thrust=False, left=False, right=False):
+        # one tick, the flags are the keys held down during it
+        prof = self.profiler
+        if prof:
+            prof.begin()
+        self.ship.angle += self.rotate_speed
+
+        if not self.game_over:
+            if thrust:
+                self.ship.thrust()
+
+            if left:
+                self.rotate_speed += 0.5
+            elif right:
+                self.rotate_speed -= 0.5
+
+            self.rotate_speed = rotate( self.rotate_speed )
+
+            self.ship.angle += self.rotate_speed
+            if prof:
+                prof.lap('input')
+
+            update_grid( self )
+            if prof:
+                prof.lap('grid')
+            bullets_hit_asteroids( self )
+            if prof:
+                prof.lap('bullets_hit_asteroids')
+            bullets_hit_ufo( self )
+            if prof:
+                prof.lap('bullets_hit_ufo')
+            collision = asteroid_vs_ship( self )
+            if prof:
+                prof.lap('asteroid_vs_ship')
+            collision = collision or ufo_vs_ship( self )
+            if prof:
+                prof.lap('ufo_vs_ship')
+            collision = collision or ufo_bullet_vs_ship( self )
+            if prof:
+                prof.lap('ufo_bullet_vs_ship')
+
+            if collision and not self.exploding_ship:
+                self.exploding_ship = ExplodingShip(self.ship, self.particles)
+                self.lives.lives -= 1
+                if self.lives.lives == 0:
+                    self.over()
+
+            if self.exploding_ship and self.exploding_ship.done():
+                self.exploding_ship = None
+                self.ship.respawn()
+
+        if self.engine == 'numpy':
+            self.update_arrays(self)
+        else:
+            for bull in self.bullets:
+                bull.update()
+            for ast in self.asteroids:
+                ast.update()
+        if prof:
+            prof.lap('entities')
+        self.particles.update()
+        if prof:
+            prof.lap('particles')
+        if self.exploding_ship:
+            self.exploding_ship.update()
+        else:
+            self.ship.update()
+        if prof:
+            prof.lap('ship')
+        self.ufo.update()
+        if prof:
+            prof.lap('ufo')
+        self.level_update()
+        if prof:
+            prof.lap('level_update')
+        self.score_update()
+        if prof:
+            prof.lap('score_update')
+
+
+class Ufo:
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.ufo = Actor( "ufo", (200,200))
+        self.ufo.scale = 2.5
+        self.bullet = Bullet()
+        self.reset()
+
+    def reset(self):
+        self.x = 0
+        self.y = 0
+        self.in_flight = False
+        self.ufo.pos = (200, 200)
+        self.angle = 0
+        self.next_appearance = self.rng.randrange(100,200)
+        self.next_disappear = -1
+        self.next_change = 0
+        self.next_shot = 0
+        self.bullet.reset()
+
+    def explode(self, particles):
+        self.in_flight = False
+        self.next_appearance = self.rng.randrange(100, 200)
+        self.next_disappear = -1
+        debris(particles, self.x, self.y, self.ufo.width, self.rng)
+
+    def update(self):
+        self.next_appearance -= 1
+        self.next_disappear -= 1
+        if not self.in_flight and self.next_appearance <= 0:
+            self.in_flight = True
+            self.x, self.y, self.angle = near_edges(self.rng)
+            self.ufo.center = self.x, self.y
+            self.next_disappear = self.rng.randrange(100,2000)
+            self.next_change = self.rng.randrange(300,1000)
+            self.next_shot = self.rng.randrange(200,500)
+
+        if self.in_flight and self.next_disappear <= 0:
+            self.in_flight = False
+            self.next_appearance = self.rng.randrange(100, 200)
+
+        if self.in_flight:
+            self.next_change -= 1
+            self.next_shot -= 1
+            if self.next_shot <= 0:
+                self.next_shot = self.rng.randrange(200, 500)
+                self.bullet.bullet_angle = self.rng.randrange(0, 360)
+                self.bullet.bullet_in_flight = True
+                self.bullet.bullet_x = self.bullet.prev_x = self.x
+                self.bullet.bullet_y = self.bullet.prev_y = self.y
+                self.bullet.bullet_speed = 12
+
+            if self.next_change <= 0:
+                self.next_change = self.rng.randrange(300, 1000)
+                self.angle = self.rng.randrange(360)
+            dx,dy = directional_movement(self.angle)
+            self.x += dx * 2.5
+            self.y += dy * 2.5
+            self.ufo.center = self.x, self.y
+            if self.ufo.bottom <= 0.0:
+                self.ufo.top = HEIGHT
+            elif self.ufo.top >= HEIGHT:
+                self.ufo.bottom = 0
+            if self.ufo.left >= WIDTH:
+                self.ufo.right = 0
+            elif self.ufo.right <= 0:
+                self.ufo.left = WIDTH
+            self.x, self.y = self.ufo.center
+
+        self.bullet.update()
+
+    def draw(self, screen):
+        if self.in_flight:
+            self.ufo.draw()
+        self.bullet.draw(screen)
+
+class Bullet:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.bullet_in_flight = False
+        self.bullet_x = 0
+        self.bullet_y = 0
+        self.bullet_angle = 0
+        self.bullet_speed = 0
+        # where the bullet was before its last move, collisions are tested
+        # along the whole path from there
+        self.prev_x = 0
+        self.prev_y = 0
+
+    def update(self):
+        if self.bullet_in_flight:
+            self.prev_x = self.bullet_x
+            self.prev_y = self.bullet_y
+            bdy, bdx = directional_movement(self.bullet_angle)
+            self.bullet_x += bdx * self.bullet_speed
+            self.bullet_y -= bdy * self.bullet_speed
+
+        if self.bullet_x < 0 or self.bullet_x > WIDTH or self.bullet_y < 0 or self.bullet_y > HEIGHT:
+            self.bullet_in_flight = False
+
+    def draw(self, screen):
+        if self.bullet_in_flight:
+            screen.draw.filled_circle((self.bullet_x,self.bullet_y), 4, (255, 255, 255))
+
+
+class Asteroid:
+    def __init__(self,init_x,init_y,speed,asteroid_size='big',rng=random):
+        self.size = asteroid_size
+        self.rng = rng
+
+        if asteroid_size == 'big':
+            self.actor = Actor("asteroid-a", center=(init_x, init_y))
+            self.actor.scale = 0.6
+        elif asteroid_size == 'medium':
+            self.actor = Actor("asteroid-b", center=(init_x, init_y))
+            self.actor.scale = 0.3
+        elif asteroid_size == 'small':
+            self.actor = Actor("asteroid-c", center=(init_x, init_y))
+            self.actor.scale = 0.2
+
+        self.reset(init_x, init_y, speed)
+
+    def reset(self, init_x, init_y, speed):
+        # also used when the pool hands out a recycled asteroid, the actor
+        # keeps its image and scale
+        self.asteroid_in_flight = True
+        self.asteroid_x = init_x
+        self.asteroid_y = init_y
+        self.asteroid_angle = self.rng.randrange(360)
+        self.speed = speed # randrange(5,10) / 5.0
+        self.actor.center = (init_x, init_y)
+
+    def explode(self, particles):
+        debris(particles, self.asteroid_x, self.asteroid_y, self.actor.width, self.rng)
+
+    def update(self):
+        if self.asteroid_in_flight:
+            bdy, bdx = directional_movement(self.asteroid_angle)
+            self.asteroid_x += bdx * self.speed
+            self.asteroid_y -= bdy * self.speed
+
+        if self.asteroid_x < -200 or self.asteroid_x > WIDTH + 200 or self.asteroid_y < -200 or self.asteroid_y > HEIGHT + 200:
+            # respawn
+            self.asteroid_x, self.asteroid_y, self.asteroid_angle = near_edges(self.rng)
+
+        self.actor.center = (self.asteroid_x, self.asteroid_y)
+
+    def draw(self, screen):
+        if self.asteroid_in_flight:
+            self.actor.draw()
+
+class AsteroidPool:
+    # iterating gives the live asteroids only. dead ones go to a free list
+    # per size and are handed out again by spawn() instead of building new
+    # Actors. live asteroids are kept in the grid, if there is one
+    def __init__(self, factory, grid=None):
+        self.factory = factory
+        self.grid = grid
+        self.live = []
+        self.free = { 'big': [], 'medium': [], 'small': [] }
+        # every asteroid ever made, in order
+        self.made = []
+
+    def __iter__(self):
+        return iter(self.live)
+
+    def __len__(self):
+        return len(self.live)
+
+    def spawn(self, x, y, speed, size='big'):
+        if self.free[size]:
+            ast = self.free[size].pop()
+            ast.reset(x, y, speed)
+        else:
+            ast = self.factory(x, y, speed, size)
+            self.made.append(ast)
+        ast.pool_index = len(self.live)
+        self.live.append(ast)
+        if self.grid:
+            self.grid.insert(ast, ast.actor, solid=True)
+        return ast
+
+    def kill(self, ast):
+        ast.asteroid_in_flight = False
+        # swap with the last live one so removal is O(1)
+        last = self.live.pop()
+        if last is not ast:
+            last.pool_index = ast.pool_index
+            self.live[ast.pool_index] = last
+        self.free[ast.size].append(ast)
+        if self.grid:
+            self.grid.remove(ast)
+
+    def clear(self):
+        while self.live:
+            self.kill(self.live[-1])
+
+class Ship:
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.actor = Actor("ship", center=(WIDTH // 2, HEIGHT // 2))
+        self.reset()
+
+    def reset(self):
+        self.respawn()
+        if self.actor.image != "ship":
+            self.actor.image = "ship"
+        self.actor.scale = 2.0
+        if self.actor.angle:
+            self.actor.angle = 0
+        self.actor.center = (self.x, self.y)
+        self.exploding = False
+        self.teleport_counter = self.rng.randrange(5, 15)
+
+    def respawn(self):
+        self.x = WIDTH // 2
+        self.y = HEIGHT // 2
+        self.dx = self.dy = 0
+        self.angle = 0
+
+    def teleport(self, game):
+        update_grid(game)
+        grid = game.grid
+        # a cell no asteroid touches, with the whole ship inside it, is safe.
+        # once the counter has run out, or when every cell is taken, the ship
+        # lands anywhere and explodes if that is on an asteroid
+        free = grid.free_cells(WIDTH, HEIGHT) if self.teleport_counter >= 0 else None
+        if free:
+            left, top = grid.cell_origin(self.rng.choice(free))
+            self.x = left + self.actor.width / 2 + self.rng.random() * (grid.cell_size - self.actor.width)
+            self.y = top + self.actor.height / 2 + self.rng.random() * (grid.cell_size - self.actor.height)
+        else:
+            self.x = self.rng.randrange(WIDTH)
+            self.y = self.rng.randrange(HEIGHT)
+        self.actor.x = self.x
+        self.actor.y = self.y
+        if not free and asteroid_vs_ship(game):
+            self.teleport_counter = self.rng.randrange(5,15)
+            game.exploding_ship = ExplodingShip(game.ship, game.particles)
+            game.lives.lives -= 1
+
+        self.teleport_counter -= 1
+
+    def update(self):
+        self.x += self.dx
+        self.y -= self.dy
+
+        ship = self.actor
+        self.actor.center = (self.x, self.y)
+        if ship.bottom <= 0.0:
+            ship.top = HEIGHT
+        elif ship.top >= HEIGHT:
+            ship.bottom = 0
+        if ship.left >= WIDTH:
+            ship.right = 0
+        elif ship.right <= 0:
+            ship.left = WIDTH
+        self.x, self.y = ship.center
+
+        self.actor.angle = self.angle
+
+    def thrust(self):
+        bdy, bdx = directional_movement(self.angle)
+        speed = sqrt( (self.dx+bdx*0.3)**2 + (self.dy+bdy*0.3)**2 )
+        if speed < 8:
+            self.dx += bdx * 0.3
+            self.dy += bdy * 0.3
+        self.actor.image = "ship-flame"
+        self.actor.scale = 2.0
+
+    def thrust_off(self):
+        self.actor.image = "ship"
+        self.actor.scale = 2.0
+
+    def draw(self, screen):
+        self.actor.draw()
+
+def debris(particles, x, y, width, rng=random):
+    nr_debris = width // 5
+    angles = []
+    lifetimes = []
+    for deb in range(nr_debris):
+        angles.append(deb * (360 / nr_debris) + rng.randrange(-20, 20))
+        lifetimes.append(rng.randrange(45, 160))
+    particles.emit(x, y, angles, lifetimes)
+
+class ExplodingShip:
+    def __init__(self, ship, particles):
+        self.ship = ship
+        rng = ship.rng
+        angles = []
+        lengths = []
+        lifetimes = []
+        for deb in range(6):
+            angles.append(deb * (360/6) + rng.randrange(-20,20))
+            lengths.append(rng.randrange(30,75))
+            lifetimes.append(rng.randrange(45,160))
+        particles.emit(ship.x, ship.y, angles, lifetimes, lengths)
+        # ticks until the last piece is gone
+        self.remaining = max(lifetimes)
+    def update(self):
+        self.remaining -= 1
+    def done(self):
+        return self.remaining <= 0
+
+class Lives:
+    def __init__(self,game):
+        # the symbols are only made once there are that many lives to show,
+        # and kept for the games after
+        self.life_symbols = []
+        self.next_x = game.lives_x
+        self.y = game.lives_y
+        self.reset(game)
+
+    def reset(self, game):
+        self.lives = game.initial_lives
+
+    def symbols(self):
+        while len(self.life_symbols) < min(self.lives, 15): # max lives
+            a = Actor("ship", center=(self.next_x, self.y ))
+            a.scale = 2.5
+            self.next_x += a.width * 1.1
+            self.life_symbols.append(a)
+        return self.life_symbols[:max(self.lives, 0)]
+
+    def draw(self, screen):
+        for symbol in self.symbols():
+            symbol.draw()
+
+
+def clip_segment(rect, x0, y0, x1, y1):
+    # the part of the segment (x0, y0) - (x1, y1) inside rect, as fractions
+    # (t0, t1) of the way along it, None if it misses (Liang-Barsky)
+    t0, t1 = 0.0, 1.0
+    dx = x1 - x0
+    dy = y1 - y0
+    for p, q in ((-dx, x0 - rect.left), (dx, rect.right - x0),
+                 (-dy, y0 - rect.top), (dy, rect.bottom - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return None
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return None
+                t1 = min(t1, t)
+    return t0, t1
+
+# the narrow phase of the collision checks, bounding rects here. t.py swaps
+# in the pixel exact ones of collision_masks.py
+def segment_hit(actor, x0, y0, x1, y1):
+    # how far along the segment it first touches the actor, None if not at all
+    span = clip_segment(actor, x0, y0, x1, y1)
+    return span and span[0]
+
+def actors_hit(a, b):
+    return a.colliderect(b)
+
+class Path:
+    # the segment a bullet moved along during the last tick. bullets move
+    # further per tick than a small asteroid is wide, so hits are tested
+    # along all of it, not just where the bullet ended up
+    def __init__(self, bullet):
+        self.x0 = bullet.prev_x
+        self.y0 = bullet.prev_y
+        self.x1 = bullet.bullet_x
+        self.y1 = bullet.bullet_y
+        # for the grid queries
+        self.left = min(self.x0, self.x1)
+        self.right = max(self.x0, self.x1)
+        self.top = min(self.y0, self.y1)
+        self.bottom = max(self.y0, self.y1)
+
+    def hit(self, actor):
+        return segment_hit(actor, self.x0, self.y0, self.x1, self.y1)
+
+def build_grid( game ):
+    # from scratch, for when the asteroids were changed without the pool
+    grid = game.grid
+    grid.clear()
+    for asteroid in game.asteroids:
+        grid.insert( asteroid, asteroid.actor, solid=True )
+    if game.engine == 'numpy':
+        game.asteroid_arrays.forget_cells()
+    update_grid( game )
+
+def update_grid( game ):
+    # moves what moved since the last tick into its new cells
+    grid = game.grid
+    if game.engine == 'numpy':
+        game.asteroid_arrays.update_grid( grid, solid=True )
+    else:
+        for asteroid in game.asteroids:
+            grid.insert( asteroid, asteroid.actor, solid=True )
+    if game.ufo.in_flight:
+        grid.insert( game.ufo, game.ufo.ufo )
+    else:
+        grid.remove( game.ufo )
+    grid.insert( game.ship, game.ship.actor )
+    # the paths of the ship's bullets, for all their collision checks
+    game.paths = [ (bullet, Path( bullet )) for bullet in game.bullets if bullet.bullet_in_flight ]
+
+def bullets_hit_asteroids( game ):
+    for bullet, path in game.paths:
+        if bullet.bullet_in_flight:
+            # the asteroid the bullet reached first
+            asteroid = None
+            first = 2.0
+            # the grid holds live asteroids only, they are all in flight
+            for candidate in game.grid.query_rect( path ):
+                if isinstance(candidate, Asteroid):
+                    t = path.hit( candidate.actor )
+                    # the order of the cells is not that of the pool, a tie
+                    # goes to the one first in the pool
+                    if t is not None and (t < first or t == first and candidate.pool_index < asteroid.pool_index):
+                        asteroid = candidate
+                        first = t
+            if asteroid:
+                # - bullet should be destroyed
+                bullet.bullet_in_flight = False
+                # - asteroid should be split in two (if it is big or medium size, if small then just destroyed)
+                asteroid.asteroid_in_flight = False
+                game.score += game.scores[asteroid.size]
+                if asteroid.size in ['big','medium']:
+                    new_size = {'big':'medium', 'medium':'small'}[asteroid.size]
+                    # the pool puts the pieces in the grid, the next bullet
+                    # can hit them in this same tick
+                    game.asteroids.spawn( asteroid.asteroid_x, asteroid.asteroid_y, asteroid.speed, new_size )
+                    game.asteroids.spawn( asteroid.asteroid_x, asteroid.asteroid_y, asteroid.speed, new_size )
+                else:
+                    asteroid.explode( game.particles )
+                game.asteroids.kill( asteroid )
+
+def bullets_hit_ufo(game):
+    for bullet, path in game.paths:
+        if bullet.bullet_in_flight and game.ufo.in_flight:
+            if game.ufo in game.grid.query_rect( path ):
+                if path.hit( game.ufo.ufo ) is not None:
+                    # - bullet should be destroyed
+                    bullet.bullet_in_flight = False
+                    game.ufo.in_flight = False
+                    game.ufo.explode( game.particles )
+                    game.score += game.scores['ufo']
+
+def ufo_bullet_vs_ship( game ):
+    bullet = game.ufo.bullet
+    if bullet.bullet_in_flight:
+        path = Path( bullet )
+        if game.ship in game.grid.query_rect( path ) and path.hit( game.ship.actor ) is not None:
+            return True
+    return False
+
+def ufo_vs_ship( game ):
+    if game.ufo.in_flight and game.ufo in game.grid.query_rect( game.ship.actor ):
+        if actors_hit( game.ship.actor, game.ufo.ufo ):
+            return True
+    return False
+
+def asteroid_vs_ship( game ):
+    for asteroid in game.grid.query_rect( game.ship.actor ):
+        if isinstance(asteroid, Asteroid):
+            if actors_hit( asteroid.actor, game.ship.actor ):
+                return True
+    return False
+
+
+def directional_movement( angle ):
+    tangle = angle + 90.0
+    tangle = radians( tangle)
+
+    delta_x = sin(tangle)
+    delta_y = cos(tangle)
+    return delta_x, delta_y
+
+def rotate( rotate_speed ):
+    if rotate_speed > 0:
+        if rotate_speed <= 0.4:
+            rotate_speed = 0
+        else:
+            rotate_speed -= 0.4
+    elif rotate_speed < 0:
+        if rotate_speed > -0.4:
+            rotate_speed = 0
+        else:
+            rotate_speed += 0.4
+
+    if rotate_speed < -5:
+        rotate_speed = -5
+    elif rotate_speed >= 5:
+        rotate_speed = 5
+
+    return rotate_speed
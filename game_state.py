@@ -0,0 +1,237 @@
+import numpy as np
+
+# snapshot() and restore() of everything that decides how a game goes on:
+# the ship, bullets, asteroids, ufo, debris, score, lives and the random
+# number generator, for lookahead searches that try thousands of futures.
+#
+# the game objects are made once per Game and reset in place by init(), so
+# a snapshot keeps them by reference and copies their fields: the numbers
+# into one flat list, the numpy columns into arrays made on the first
+# snapshot. passing an old snapshot as into reuses all of that. Actors,
+# surfaces and the highscores are left alone, they are set from the state
+# or not part of it. the grid is rebuilt by Game.restore().
+
+GAME = 11
+SHIP = 10
+UFO = 10
+BULLET = 7
+ASTEROID = 7
+
+PARTICLE_COLUMNS = ('x', 'y', 'dx', 'dy', 'hx', 'hy', 'line', 'lifetime')
+ENTITY_COLUMNS = ('x', 'y', 'px', 'py', 'angle', 'speed', 'size', 'in_flight')
+
+
+class Snapshot:
+    def __init__(self):
+        self.objects = None
+        self.values = []
+        self.live = []
+        self.free = { 'big': [], 'medium': [], 'small': [] }
+        self.made = 0
+        self.rng = None
+        # particles
+        self.next = 0
+        self.busy = 0
+        self.particles = {}
+        # numpy engine, (EntityArrays, count, copies of its columns)
+        self.bullet_arrays = None
+        self.asteroid_arrays = None
+
+
+def copy_columns(arrays, names, into):
+    # into the preallocated copies, remade only when the capacity changed
+    for name in names:
+        column = getattr(arrays, name)
+        copy = into.get(name)
+        if copy is None or len(copy) != len(column):
+            into[name] = column.copy()
+        else:
+            np.copyto(copy, column)
+    return into
+
+def copy_back(arrays, names, copies, count=None):
+    # the first count slots, all of the copy by default
+    for name in names:
+        column = getattr(arrays, name)
+        copy = copies[name]
+        n = len(copy) if count is None else count
+        np.copyto(column[:n], copy[:n])
+
+def save_bullet(v, b):
+    v.extend((b.bullet_in_flight, b.bullet_x, b.bullet_y, b.bullet_angle, b.bullet_speed, b.prev_x, b.prev_y))
+
+def load_bullet(v, i, b):
+    (b.bullet_in_flight, b.bullet_x, b.bullet_y, b.bullet_angle, b.bullet_speed,
+     b.prev_x, b.prev_y) = v[i:i + BULLET]
+    return i + BULLET
+
+def save_arrays(arrays, previous):
+    copies = previous[2] if previous else {}
+    return arrays, arrays.count, copy_columns(arrays, ENTITY_COLUMNS, copies)
+
+def load_arrays(saved):
+    arrays, count, copies = saved
+    # slots of entities made after the snapshot keep their size, their
+    # objects went back on the free list of that size
+    copy_back(arrays, ENTITY_COLUMNS, copies, count)
+    arrays.in_flight[count:] = False
+
+
+def snapshot(game, into=None):
+    snap = into or Snapshot()
+    ship = game.ship
+    ufo = game.ufo
+    pool = game.asteroids
+    numpy_engine = game.engine == 'numpy'
+    snap.objects = (ship, ufo, game.bullets, pool, game.lives, game.exploding_ship)
+
+    v = snap.values
+    v.clear()
+    v.extend((game.level, game.rotate_speed, game.score, game.prev_score, game.initials,
+              game.game_over, game.get_highscore, game.show_highscore, game.restart,
+              game.lives.lives, game.exploding_ship.remaining if game.exploding_ship else 0))
+    actor = ship.actor
+    v.extend((ship.x, ship.y, ship.dx, ship.dy, ship.angle, ship.teleport_counter,
+              actor.image, actor.x, actor.y, actor.angle))
+    v.extend((ufo.x, ufo.y, ufo.angle, ufo.in_flight, ufo.next_appearance, ufo.next_disappear,
+              ufo.next_change, ufo.next_shot, ufo.ufo.x, ufo.ufo.y))
+    save_bullet(v, ufo.bullet)
+
+    snap.live[:] = pool.live
+    for size, free in pool.free.items():
+        snap.free[size][:] = free
+    snap.made = len(pool.made)
+    if numpy_engine:
+        snap.bullet_arrays = save_arrays(game.bullet_arrays, snap.bullet_arrays)
+        snap.asteroid_arrays = save_arrays(game.asteroid_arrays, snap.asteroid_arrays)
+    else:
+        for bullet in game.bullets:
+            save_bullet(v, bullet)
+        for ast in pool.live:
+            v.extend((ast.asteroid_in_flight, ast.asteroid_x, ast.asteroid_y, ast.asteroid_angle,
+                      ast.speed, ast.actor.x, ast.actor.y))
+
+    # nothing to copy while there is no debris
+    particles = game.particles
+    snap.next = particles.next
+    snap.busy = particles.busy
+    if particles.busy:
+        copy_columns(particles, PARTICLE_COLUMNS, snap.particles)
+
+    snap.rng = game.rng.getstate()
+    return snap
+
+def restore(game, snap):
+    ship, ufo, bullets, pool, lives, exploding_ship = snap.objects
+    game.ship = ship
+    game.ufo = ufo
+    game.bullets = bullets
+    game.asteroids = pool
+    game.lives = lives
+    game.exploding_ship = exploding_ship
+
+    v = snap.values
+    (game.level, game.rotate_speed, game.score, game.prev_score, game.initials,
+     game.game_over, game.get_highscore, game.show_highscore, game.restart,
+     lives.lives, remaining) = v[:GAME]
+    if exploding_ship:
+        exploding_ship.remaining = remaining
+    i = GAME
+
+    actor = ship.actor
+    (ship.x, ship.y, ship.dx, ship.dy, ship.angle, ship.teleport_counter,
+     image, actor.x, actor.y, angle) = v[i:i + SHIP]
+    # setting these can mean new surfaces, only when they changed
+    if actor.image != image:
+        actor.image = image
+        actor.scale = 2.0
+    if actor.angle != angle:
+        actor.angle = angle
+    i += SHIP
+    (ufo.x, ufo.y, ufo.angle, ufo.in_flight, ufo.next_appearance, ufo.next_disappear,
+     ufo.next_change, ufo.next_shot, ufo.ufo.x, ufo.ufo.y) = v[i:i + UFO]
+    i = load_bullet(v, i + UFO, ufo.bullet)
+
+    # asteroids made since the snapshot are free again
+    pool.live[:] = snap.live
+    for size, free in pool.free.items():
+        free[:] = snap.free[size]
+    for ast in pool.made[snap.made:]:
+        ast.asteroid_in_flight = False
+        pool.free[ast.size].append(ast)
+    if game.engine == 'numpy':
+        game.bullet_arrays = snap.bullet_arrays[0]
+        game.asteroid_arrays = snap.asteroid_arrays[0]
+        load_arrays(snap.bullet_arrays)
+        load_arrays(snap.asteroid_arrays)
+        # the actors are put where the arrays say when they are asked for
+        for index, ast in enumerate(pool.live):
+            ast.pool_index = index
+    else:
+        for bullet in bullets:
+            i = load_bullet(v, i, bullet)
+        for index, ast in enumerate(pool.live):
+            ast.pool_index = index
+            (ast.asteroid_in_flight, ast.asteroid_x, ast.asteroid_y, ast.asteroid_angle,
+             ast.speed, ast.actor.x, ast.actor.y) = v[i:i + ASTEROID]
+            i += ASTEROID
+
+    particles = game.particles
+    particles.next = snap.next
+    if snap.busy:
+        copy_back(particles, PARTICLE_COLUMNS, snap.particles)
+        particles.busy = snap.busy
+    elif particles.busy:
+        particles.clear()
+
+    game.rng.setstate(snap.rng)
+
+
+# self check, python game_state.py: a seeded game played on from a snapshot
+# must go the same way again after restore(), in both engines, and an
+# asteroid made after the snapshot keeps its size when it is handed out again
+
+def state(game):
+    return (game.score, game.lives.lives, game.level, game.ship.x, game.ship.y,
+            sorted((ast.size, ast.asteroid_x, ast.asteroid_y) for ast in game.asteroids))
+
+def replays(engine, seed, ticks=700):
+    import random
+    from headless import Simulation, random_inputs
+    random.seed(seed)
+    sim = Simulation(engine=engine, seed=seed)
+    for tick in range(200):
+        sim.step(random_inputs(tick))
+    snap = sim.game.snapshot()
+    held = sim.held
+    inputs = [ random_inputs(tick) for tick in range(ticks) ]
+    runs = []
+    for _ in range(2):
+        sim.game.restore(snap)
+        sim.held = held
+        states = []
+        for i in inputs:
+            sim.step(i)
+            states.append(state(sim.game))
+        runs.append(states)
+    return runs[0] == runs[1]
+
+def keeps_sizes(engine):
+    from game_core import Game
+    game = Game(engine=engine, seed=1)
+    snap = game.snapshot()
+    for size in ('medium', 'small'):
+        game.asteroids.spawn(0, 0, 1, size)
+    game.restore(snap)
+    return all(game.asteroids.spawn(0, 0, 1, size).size == size for size in ('medium', 'small'))
+
+if __name__ == '__main__':
+    failed = []
+    for engine in ('python', 'numpy'):
+        if not keeps_sizes(engine):
+            failed.append(f"{engine}: an asteroid made after the snapshot changed size")
+        for seed in range(6):
+            if not replays(engine, seed):
+                failed.append(f"{engine} seed {seed}: the game went another way after restore()")
+    print('\n'.join(failed) or "ok")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,123 @@
+import argparse
+import random
+import time
+from dataclasses import dataclass
+import os
+from game_core import Game, ROTATE_LEFT, ROTATE_RIGHT, THRUST_ON, THRUST_OFF, TELEPORT, FIRE, RESTART
+from journal import JournalWriter, held_mask
+
+# runs the game logic without pgzero, a display or fonts. game_core.Actor
+# stays the plain Box, so hitboxes are simple rects and nothing is loaded.
+#
+#   sim = Simulation()
+#   while not sim.step(Inputs(thrust=True, fire=True)):
+#       ...
+#
+# or as a soak test:  python headless.py --ticks 1000000 --seed 1
+# recorded for replay:  python headless.py --seed 1 --record soak.journal
+
+
+@dataclass
+class Inputs:
+    # keys held down during the tick, like keyboard.W / A / D in t.py
+    thrust : bool = False
+    left : bool = False
+    right : bool = False
+    # keys pressed at the start of the tick
+    fire : bool = False
+    teleport : bool = False
+
+NO_INPUT = Inputs()
+
+
+class Simulation:
+    def __init__(self, engine='python', highscores=None, seed=None, journal=None):
+        self.game = Game(highscores, engine=engine, seed=seed)
+        self.held = NO_INPUT
+        self.ticks = 0
+        # a journal.JournalWriter to record the ticks in, None to not record
+        self.journal = journal
+
+    def reset(self):
+        if self.journal:
+            self.journal.tick(0, RESTART)
+        self.game.init()
+        self.held = NO_INPUT
+
+    def events(self, inputs):
+        # the key events t.py's on_key_down / on_key_up would see when the
+        # keys change from self.held to inputs
+        held = self.held
+        events = 0
+        # every key that goes down is an event of its own, as in t.py
+        if inputs.left and not held.left:
+            events |= ROTATE_LEFT
+        if inputs.right and not held.right:
+            events |= ROTATE_RIGHT
+        if inputs.thrust and not held.thrust:
+            events |= THRUST_ON
+        if held.thrust and not inputs.thrust:
+            events |= THRUST_OFF
+        if inputs.teleport:
+            events |= TELEPORT
+        if inputs.fire:
+            events |= FIRE
+        return events
+
+    def step(self, inputs=NO_INPUT):
+        # advance one tick, returns True once the game is over
+        events = self.events(inputs)
+        if self.journal:
+            self.journal.tick(held_mask(inputs.thrust, inputs.left, inputs.right), events)
+        self.game.key_events(events)
+        self.held = inputs
+        self.game.update(inputs.thrust, inputs.left, inputs.right)
+        self.ticks += 1
+        return self.game.game_over
+
+
+def random_inputs(tick):
+    return Inputs(
+        thrust = random.random() < 0.3,
+        left = random.random() < 0.2,
+        right = random.random() < 0.2,
+        fire = tick % 7 == 0,
+        teleport = random.random() < 0.002,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='run the game without a display')
+    parser.add_argument('--ticks', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--record', help='write an input journal for replay.py')
+    parser.add_argument('--spectate', type=int, metavar='PORT', help='stream the game to spectator.py, at 60 ticks/s')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    seed = args.seed if args.seed is not None else int.from_bytes(os.urandom(8), 'little')
+    journal = JournalWriter(args.record, seed) if args.record else None
+    sim = Simulation(engine=args.engine, seed=seed, journal=journal)
+    spectators = None
+    if args.spectate is not None:
+        from spectator_server import SpectatorServer
+        spectators = SpectatorServer(port=args.spectate).start()
+        print(f"spectate on port {spectators.port}")
+    games = 1
+    start = time.perf_counter()
+    for tick in range(args.ticks):
+        if sim.step(random_inputs(tick)):
+            sim.reset()
+            games += 1
+        if spectators:
+            spectators.publish(sim.game)
+            time.sleep(max(0.0, start + (tick + 1) / 60 - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    if journal:
+        journal.close()
+    if spectators:
+        spectators.close()
+    print(f"{args.ticks} ticks, {games} games, {elapsed:.2f}s, {args.ticks / elapsed:.0f} ticks/s")
+
+if __name__ == '__main__':
+    main()
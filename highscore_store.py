@@ -0,0 +1,254 @@
+import ast
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from itertools import islice
+from leaderboard import Leaderboard
+
+# the high score file, JSON that is parsed and never executed. every score
+# ever entered is kept, so it is never rewritten when a score is saved:
+#
+#   highscores.json        {"log": n} and then one {"initials", "score"} per
+#                          line, best first, every score up to log n
+#   highscores.json.n.log  one line per score entered since, appended
+#
+# saving a score appends a line from a background thread. once the log has
+# compact_every scores the same thread writes a new highscores.json from a
+# Leaderboard.snapshot() and starts log n + 1. that is a chunk of lines at a
+# time with a yield in between, the json encoder holds the GIL while it runs
+# and a million scores in one go would stall the game for a second.
+# highscores.json is replaced atomically and the logs before n are deleted
+# after that, a crash at any point loses nothing and counts nothing twice.
+#
+# at startup only the top of the file and the log are read, the rest of the
+# file is read by another thread and handed over by poll().
+
+PATH = os.environ.get('ASTEROIDS_HIGHSCORES', 'highscores.json')
+# the old formats: a python file that used to be exec'd on startup, and
+# {"highscores": [...]} written in one go
+LEGACY_PATH = 'hsdb.py'
+COMPACT_EVERY = 1000
+# lines read or written between yields to the game thread
+CHUNK = 512
+
+
+def parse(text):
+    scores = json.loads(text)['highscores']
+    return [ {'initials': str(item['initials']), 'score': int(item['score'])} for item in scores ]
+
+def parse_legacy(text):
+    # "highscores = [...]", read as a literal
+    for node in ast.parse(text).body:
+        if isinstance(node, ast.Assign) and [ t.id for t in node.targets if isinstance(t, ast.Name) ] == ['highscores']:
+            return [ {'initials': str(item['initials']), 'score': int(item['score'])}
+                     for item in ast.literal_eval(node.value) ]
+    raise ValueError('no highscores in ' + LEGACY_PATH)
+
+def parse_line(line):
+    item = json.loads(line)
+    return {'initials': str(item['initials']), 'score': int(item['score'])}
+
+def line(item):
+    return json.dumps({'initials': item['initials'], 'score': item['score']}, separators=(',', ':')) + '\n'
+
+def log_path(path, n):
+    return f'{path}.{n}.log'
+
+def read_log(path):
+    try:
+        with open(path) as f:
+            return [ parse_line(text) for text in f if text.strip() ]
+    except FileNotFoundError:
+        return None
+
+def append(path, item):
+    with open(path, 'a') as f:
+        f.write(line(item))
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_atomic(path, log, highscores):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.highscores-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps({'log': log}) + '\n')
+            highscores = iter(highscores)
+            while True:
+                chunk = list(islice(highscores, CHUNK))
+                if not chunk:
+                    break
+                f.write(''.join(map(line, chunk)))
+                time.sleep(0)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class HighscoreStore:
+    def __init__(self, path=PATH, legacy_path=LEGACY_PATH, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self.board = None
+        # the log scores are appended to and how many it has
+        self.log = 0
+        self.logged = 0
+        # scores added since startup while the rest of the file is being
+        # read, None once the board holds every score
+        self.added = None
+        self.rest = None
+        # the file is in one of the old formats, the first save rewrites it
+        self.rewrite = False
+        self.jobs = []
+        self.writing = False
+        self.lock = threading.Condition()
+        self.thread = None
+
+    def load(self, default):
+        # the Leaderboard, only the first call touches the disk
+        if self.board is None:
+            self.board = self.read(default)
+        return self.board
+
+    def read(self, default):
+        entries = None
+        try:
+            with open(self.path) as f:
+                first = f.readline()
+                header = json.loads(first)
+                if 'log' in header:
+                    self.log = header['log']
+                    # the table on screen, the rest comes later
+                    entries = [ parse_line(text) for text in islice(f, 10) ]
+                    self.added = []
+                else:
+                    # the old format, whole
+                    entries = parse(first + f.read())
+                    self.rewrite = True
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"ignoring broken high score file {self.path}: {e}")
+            entries = None
+            self.added = None
+        if entries is None:
+            try:
+                with open(self.legacy_path) as f:
+                    entries = parse_legacy(f.read())
+                self.rewrite = True
+            except FileNotFoundError:
+                pass
+            except (ValueError, KeyError, TypeError, SyntaxError) as e:
+                print(f"ignoring broken high score file {self.legacy_path}: {e}")
+        board = Leaderboard(entries if entries is not None else default())
+
+        # the scores entered since highscores.json was written
+        while True:
+            try:
+                scores = read_log(log_path(self.path, self.log))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"ignoring the rest of a broken high score log: {e}")
+                scores = None
+            if scores is None:
+                break
+            for item in scores:
+                board.add(item['initials'], item['score'])
+                if self.added is not None:
+                    self.added.append(item)
+            # a rewrite that failed leaves the scores after it in the next log
+            if os.path.exists(log_path(self.path, self.log + 1)):
+                self.log += 1
+            else:
+                self.logged = len(scores)
+                break
+
+        if self.added is not None:
+            threading.Thread(target=self.read_rest, name='highscore-reader', daemon=True).start()
+        return board
+
+    def read_rest(self):
+        # every score of highscores.json, a chunk of lines at a time
+        entries = []
+        try:
+            with open(self.path) as f:
+                f.readline()
+                while True:
+                    lines = list(islice(f, CHUNK))
+                    if not lines:
+                        break
+                    entries.extend(parse_line(text) for text in lines)
+                    time.sleep(0)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"could not read all high scores from {self.path}: {e}")
+            return
+        board = Leaderboard(entries, ordered=True)
+        with self.lock:
+            self.rest = board
+
+    def poll(self):
+        # the Leaderboard with every score, once, when the rest of the file
+        # has been read. called by the game thread, which owns the boards
+        if self.rest is None:
+            return None
+        with self.lock:
+            board = self.rest
+            self.rest = None
+        for item in self.added:
+            board.add(item['initials'], item['score'])
+        self.added = None
+        self.board = board
+        return board
+
+    def add(self, initials, score):
+        # into the board and the log, returns at once
+        self.board.add(initials, score)
+        item = {'initials': initials, 'score': score}
+        if self.added is not None:
+            self.added.append(item)
+        self.logged += 1
+        with self.lock:
+            self.jobs.append((log_path(self.path, self.log), item))
+            # only once every score is in the board
+            if (self.rewrite or self.logged >= self.compact_every) and self.added is None:
+                self.rewrite = False
+                self.log += 1
+                self.logged = 0
+                self.jobs.append((self.log, self.board.snapshot()))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.writer, name='highscore-writer', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+            self.lock.notify_all()
+
+    def writer(self):
+        while True:
+            with self.lock:
+                while not self.jobs:
+                    self.lock.wait()
+                target, data = self.jobs.pop(0)
+                self.writing = True
+            try:
+                if isinstance(target, str):
+                    append(target, data)
+                else:
+                    write_atomic(self.path, target, data)
+                    n = target - 1
+                    while os.path.exists(log_path(self.path, n)):
+                        os.remove(log_path(self.path, n))
+                        n -= 1
+            except OSError as e:
+                print(f"could not save high scores to {self.path}: {e}")
+            with self.lock:
+                self.writing = False
+                self.lock.notify_all()
+
+    def flush(self, timeout=5.0):
+        # wait for the saved scores to reach the disk, called at exit
+        with self.lock:
+            self.lock.wait_for(lambda: not self.jobs and not self.writing, timeout)
@@ -0,0 +1,63 @@
+import struct
+
+# input journal: the seed of a game and the keys of every tick, enough to
+# replay it exactly (replay.py). two bytes per tick, the keys held down and
+# the key events (game_core.ROTATE_LEFT ...), after a fixed header:
+#
+#   magic, version, seed, actor, rotation steps
+#
+# actor is how hitboxes were computed when it was recorded, 'box' for the
+# headless game_core.Box, 'sprite' for sprite_cache.CachedActor with the
+# given rotation steps, 'mask' for those plus the pixel exact collisions of
+# collision_masks.py. a replay has to use the same to stay in sync.
+
+MAGIC = b'AJRN'
+VERSION = 1
+HEADER = struct.Struct('<4sBQBH')
+ACTORS = [ 'box', 'sprite', 'mask' ]
+
+# keys held down during a tick
+THRUST = 1
+LEFT = 2
+RIGHT = 4
+
+def held_mask(thrust, left, right):
+    return (THRUST if thrust else 0) | (LEFT if left else 0) | (RIGHT if right else 0)
+
+def held_keys(mask):
+    return bool(mask & THRUST), bool(mask & LEFT), bool(mask & RIGHT)
+
+
+class JournalWriter:
+    def __init__(self, path, seed, actor='box', rotation_steps=0, flush_every=4096):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, ACTORS.index(actor), rotation_steps))
+        self.buffer = bytearray()
+        self.flush_every = flush_every * 2
+
+    def tick(self, held, events):
+        self.buffer.append(held)
+        self.buffer.append(events)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_journal(path):
+    # returns the header as a dict and the tick bytes
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, actor, rotation_steps = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} input journal")
+    header = { 'seed': seed, 'actor': ACTORS[actor], 'rotation_steps': rotation_steps }
+    return header, memoryview(data)[HEADER.size:]
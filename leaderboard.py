@@ -0,0 +1,136 @@
+from bisect import bisect_left, insort
+from itertools import count
+
+# every score ever entered, highest first. the entries are kept in a sorted
+# index: a list of sorted buckets of a few hundred entries each, and a fenwick
+# tree over the bucket sizes. adding a score, the rank of a score and the
+# entry at a rank are all a bisect plus a walk down the tree, so the "top 10"
+# check at game over stays cheap with millions of scores.
+#
+# iterating gives the top table as {'initials', 'score'} dicts, the shape
+# game.highscores had when it was a plain list of 10.
+
+LOAD = 512
+
+
+class Leaderboard:
+    def __init__(self, entries=(), size=10, ordered=False):
+        # size is the length of the table shown on screen
+        self.size = size
+        self.seq = count()
+        self.count = 0
+        self.buckets = []
+        self.maxes = []
+        self.tree = [0]
+        self.extend(entries, ordered)
+
+    def key(self, initials, score):
+        # highest score first, equal scores in the order they were entered
+        return (-int(score), next(self.seq), str(initials))
+
+    def extend(self, entries, ordered=False):
+        # bulk ingest: one sort of everything and a rebuild, instead of an
+        # insert per entry. ordered entries are best first and all rank below
+        # the ones there are, like those of snapshot(), and are not sorted
+        keys = [ key for bucket in self.buckets for key in bucket ]
+        keys.extend(self.key(item['initials'], item['score']) for item in entries)
+        if not ordered:
+            keys.sort()
+        self.buckets = [ keys[i:i + LOAD] for i in range(0, len(keys), LOAD) ]
+        self.count = len(keys)
+        self.rebuild()
+
+    def rebuild(self):
+        self.maxes = [ bucket[-1] for bucket in self.buckets ]
+        tree = [0] * (len(self.buckets) + 1)
+        for i, bucket in enumerate(self.buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, initials, score):
+        key = self.key(initials, score)
+        self.count += 1
+        if not self.buckets:
+            self.buckets.append([key])
+            self.rebuild()
+            return
+        i = min(bisect_left(self.maxes, key), len(self.buckets) - 1)
+        # buckets are never changed in place, a snapshot may still hold them
+        bucket = self.buckets[i][:]
+        insort(bucket, key)
+        self.buckets[i] = bucket
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * LOAD:
+            self.buckets[i:i + 1] = [ bucket[:LOAD], bucket[LOAD:] ]
+            self.rebuild()
+        else:
+            j = i + 1
+            while j < len(self.tree):
+                self.tree[j] += 1
+                j += j & -j
+
+    def before(self, i):
+        # number of entries in the buckets before bucket i
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def locate(self, index):
+        # bucket and offset of the entry at index
+        pos = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if pos + step < len(self.tree) and self.tree[pos + step] <= index:
+                pos += step
+                index -= self.tree[pos]
+            step >>= 1
+        return pos, index
+
+    def rank(self, score):
+        # 1 based place a new score would get, after the equal scores
+        key = (-int(score), float('inf'))
+        i = bisect_left(self.maxes, key)
+        if i == len(self.buckets):
+            return self.count + 1
+        return self.before(i) + bisect_left(self.buckets[i], key) + 1
+
+    def entries(self, start, stop):
+        start = max(start, 0)
+        stop = min(stop, self.count)
+        if start >= stop:
+            return []
+        i, offset = self.locate(start)
+        result = []
+        while len(result) < stop - start:
+            for score, _, initials in self.buckets[i][offset:offset + stop - start - len(result)]:
+                result.append({'initials': initials, 'score': -score})
+            i += 1
+            offset = 0
+        return result
+
+    def top(self, k=None):
+        return self.entries(0, self.size if k is None else k)
+
+    def around(self, rank, n=5):
+        # the entries from n places above to n places below a 1 based rank
+        return self.entries(rank - 1 - n, rank + n)
+
+    def qualifies(self, score):
+        # a score makes the table when it at least equals the last entry of it
+        if self.count < self.size:
+            return True
+        return score >= self.entries(self.size - 1, self.size)[0]['score']
+
+    def snapshot(self):
+        # all entries for the high score file. only the bucket list is copied
+        # here, the dicts are built by whoever iterates, e.g. the writer thread
+        buckets = list(self.buckets)
+        return ( {'initials': initials, 'score': -score} for bucket in buckets for score, _, initials in bucket )
+
+    def __iter__(self):
+        return iter(self.top())
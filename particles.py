@@ -0,0 +1,89 @@
+import numpy as np
+
+# all explosion debris of a game in one fixed size ring buffer. asteroid and
+# ufo explosions emit dots, the ship emits short lines. a new explosion
+# overwrites the oldest particles once the buffer is full, so the cost per
+# frame is bounded by the capacity no matter how many things blow up.
+
+NONE = np.zeros(0)
+
+
+class Particles:
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.next = 0
+        # ticks until every particle has expired, nothing to do while zero
+        self.busy = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        # half of the line for ship debris, zero for dots
+        self.hx = np.zeros(capacity)
+        self.hy = np.zeros(capacity)
+        self.line = np.zeros(capacity, dtype=bool)
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+
+    def emit(self, x, y, angles, lifetimes, lengths=None):
+        n = len(angles)
+        slots = (self.next + np.arange(n)) % self.capacity
+        self.next = (self.next + n) % self.capacity
+        angles = np.asarray(angles, dtype=float)
+        # directional_movement(angle + 90) * 0.3, like the old Debris pieces
+        tangle = np.radians(angles + 180.0)
+        self.x[slots] = x
+        self.y[slots] = y
+        self.dx[slots] = np.sin(tangle) * 0.3
+        self.dy[slots] = np.cos(tangle) * 0.3
+        self.lifetime[slots] = lifetimes
+        if n:
+            self.busy = max(self.busy, max(lifetimes))
+        if lengths is None:
+            self.line[slots] = False
+            self.hx[slots] = 0
+            self.hy[slots] = 0
+        else:
+            # directional_movement(angle) * length / 2
+            tangle = np.radians(angles + 90.0)
+            half = np.asarray(lengths, dtype=float) / 2
+            self.line[slots] = True
+            self.hx[slots] = np.sin(tangle) * half
+            self.hy[slots] = np.cos(tangle) * half
+
+    def update(self):
+        if not self.busy:
+            return
+        self.busy -= 1
+        live = self.lifetime > 0
+        self.x[live] += self.dx[live]
+        self.y[live] += self.dy[live]
+        self.lifetime[live] -= 1
+
+    def clear(self):
+        self.lifetime[:] = 0
+        self.busy = 0
+
+    def count(self):
+        return int(np.count_nonzero(self.lifetime > 0))
+
+    def dots(self, back=0):
+        # back: positions that many ticks earlier, for drawing between ticks
+        if not self.busy:
+            return NONE, NONE
+        live = (self.lifetime > 0) & ~self.line
+        if back:
+            return self.x[live] - self.dx[live] * back, self.y[live] - self.dy[live] * back
+        return self.x[live], self.y[live]
+
+    def lines(self, back=0):
+        if not self.busy:
+            return NONE, NONE, NONE, NONE
+        live = (self.lifetime > 0) & self.line
+        x = self.x[live]
+        y = self.y[live]
+        if back:
+            x = x - self.dx[live] * back
+            y = y - self.dy[live] * back
+        hx = self.hx[live]
+        hy = self.hy[live]
+        return x + hx, y + hy, x - hx, y - hy
@@ -0,0 +1,73 @@
+import csv
+import time
+import numpy as np
+
+# per phase timing of every frame, for finding frame drops on a cabinet
+# without an external profiler. Game.update() and render.draw() call lap()
+# after each phase when a profiler is attached, and do nothing else when it
+# is not. the last `capacity` frames are kept in a ring buffer, shown by the
+# overlay and written out as CSV.
+
+UPDATE_PHASES = [ 'input', 'grid', 'bullets_hit_asteroids', 'bullets_hit_ufo', 'asteroid_vs_ship',
+                  'ufo_vs_ship', 'ufo_bullet_vs_ship', 'entities', 'particles', 'ship', 'ufo',
+                  'level_update', 'score_update' ]
+DRAW_PHASES = [ 'draw_asteroids', 'draw_bullets', 'draw_ship', 'draw_particles', 'draw_lives',
+                'draw_ufo', 'draw_text' ]
+PHASES = UPDATE_PHASES + DRAW_PHASES
+COUNTS = [ 'asteroids', 'bullets', 'particles', 'ufo' ]
+
+
+class Profiler:
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.column = { phase: i for i, phase in enumerate(PHASES) }
+        # seconds per phase and entity counts, one row per frame
+        self.times = np.zeros((capacity, len(PHASES)))
+        self.counts = np.zeros((capacity, len(COUNTS)), dtype=np.int32)
+        self.frames = 0
+        self.row = [0.0] * len(PHASES)
+        self.last = time.perf_counter()
+        self.visible = False
+
+    def begin(self):
+        # start of a timed stretch, time before it is not put on any phase
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.row[self.column[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self, game):
+        i = self.frames % self.capacity
+        self.times[i] = self.row
+        self.counts[i] = (len(game.asteroids), sum(b.bullet_in_flight for b in game.bullets),
+                          game.particles.count(), game.ufo.in_flight)
+        self.frames += 1
+        self.row = [0.0] * len(PHASES)
+
+    def recorded(self):
+        # rows of the buffer, oldest first
+        n = min(self.frames, self.capacity)
+        start = self.frames - n
+        order = (np.arange(n) + start) % self.capacity
+        return start, self.times[order], self.counts[order]
+
+    def summary(self):
+        # (phase, current ms, p99 ms) and the current entity counts
+        if not self.frames:
+            return [], {}
+        _, times, counts = self.recorded()
+        p99 = np.percentile(times, 99, axis=0) * 1000
+        current = times[-1] * 1000
+        phases = [ (phase, current[i], p99[i]) for i, phase in enumerate(PHASES) ]
+        phases.append(('total', current.sum(), np.percentile(times.sum(axis=1), 99) * 1000))
+        return phases, dict(zip(COUNTS, counts[-1].tolist()))
+
+    def write_csv(self, path):
+        start, times, counts = self.recorded()
+        with open(path, 'w', newline='') as f:
+            out = csv.writer(f)
+            out.writerow([ 'frame' ] + [ p + '_ms' for p in PHASES ] + COUNTS)
+            for n, (t, c) in enumerate(zip((times * 1000).round(4).tolist(), counts.tolist())):
+                out.writerow([ start + n ] + t + c)
@@ -0,0 +1,226 @@
+import pygame
+from game_core import WIDTH, HEIGHT
+from text_cache import TextCache, DigitAtlas
+from sprite_cache import sprites
+
+# drawing of a game_core.Game onto a pygame surface. t.py calls draw() every
+# frame, benchmark.py uses it to time rendering without the pgzero runner.
+#
+# the game plays in 2500x2000 coordinates. with a render scale below 1 the
+# frame is drawn into a smaller off-screen surface, sprites and fonts scaled
+# to match, and a single scaled blit presents it in the window.
+
+WHITE = (255, 255, 255)
+
+render_scale = 1.0
+target = None
+
+# a dirty_rects.DirtyRects when only the changed parts of the screen are
+# redrawn, None to clear and redraw everything every frame
+dirty = None
+
+# a profiler.Profiler to time the phases of draw(), None when off
+profiler = None
+
+# a fixed_step.FixedStep when the simulation runs at a fixed tick rate, the
+# moving things are then drawn between their last two positions
+blend = None
+
+def S(value):
+    # game coordinates to render coordinates
+    return int(value * render_scale)
+
+def set_render_scale(scale):
+    global render_scale, target, text_cache, score_digits, DOT, BULLET_RADIUS
+    render_scale = scale
+    target = pygame.Surface((S(WIDTH), S(HEIGHT))) if scale != 1 else None
+
+    fonts.clear()
+    text_cache = TextCache()
+    score_digits = None
+
+    # one debris dot, blitted for every live particle in a single blits() call
+    radius = max(1, S(2))
+    DOT = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+    pygame.draw.circle(DOT, WHITE, (radius, radius), radius)
+    BULLET_RADIUS = max(1, S(4))
+
+    if dirty:
+        dirty.invalidate()
+
+# Hyperspace.otf by point size, each loaded the first time it is needed: the
+# score on the first frame, the bigger ones only at game over
+fonts = {}
+
+def font(size):
+    f = fonts.get(size)
+    if f is None:
+        f = fonts[size] = pygame.font.Font('images/Hyperspace.otf', S(size))
+    return f
+
+def mark(rect):
+    if dirty:
+        dirty.add(rect)
+
+def draw_actor(surface, actor):
+    x, y, angle = actor.x, actor.y, actor.angle
+    if blend:
+        x, y, angle = blend.at(actor, x, y, angle)
+    image = sprites.get(actor.image, actor.scale * render_scale, angle)
+    w, h = image.get_size()
+    mark(surface.blit(image, (x * render_scale - w / 2, y * render_scale - h / 2)))
+
+def draw_bullet(surface, bullet):
+    if bullet.bullet_in_flight:
+        x, y = bullet.bullet_x, bullet.bullet_y
+        if blend:
+            x, y, _ = blend.at(bullet, x, y)
+        pos = (round(x * render_scale), round(y * render_scale))
+        mark(pygame.draw.circle(surface, WHITE, pos, BULLET_RADIUS))
+
+def display_score(surface, game):
+    scoreStr = str("%02d" % game.score)
+    global score_digits
+    if score_digits is None:
+        score_digits = DigitAtlas(font(100), WHITE)
+    scoreText = score_digits.render(scoreStr)
+    scoreTextRect = scoreText.get_rect(left = S(game.score_x), top = S(game.score_y) )
+    mark(surface.blit(scoreText, scoreTextRect))
+
+def display_end(surface, game):
+    end_text = text_cache.render(font(300), "GAME OVER", WHITE)
+    end_rect = end_text.get_rect(centerx = S(WIDTH//2), centery = S(HEIGHT//2 - 150) )
+    mark(surface.blit(end_text, end_rect))
+
+
+def display_high_dialog(surface, game):
+    hi_text = text_cache.render(font(150), "TOP 10 SCORE", WHITE)
+    hi_rect = hi_text.get_rect(centerx = S(WIDTH//2), centery = S(HEIGHT//2 + 100) )
+    mark(surface.blit(hi_text, hi_rect))
+    init_text = text_cache.render(font(150), f"ENTER INITIALS:{game.initials}", WHITE)
+    init_rect = init_text.get_rect(centerx = S(WIDTH//2), centery = S(HEIGHT//2 + 250) )
+    mark(surface.blit(init_text, init_rect))
+
+highscore_lines = { 'key': None, 'lines': [] }
+
+def highscore_table(game):
+    # the table text is only formatted again when the scores change, the
+    # leaderboard already hands out the top entries in order
+    key = tuple( (item['initials'], item['score']) for item in game.highscores )
+    if key != highscore_lines['key']:
+        lines = []
+        for item in game.highscores:
+            istr = "--" if len(item['initials']) == 0 else item['initials']
+            lines.append(f"{istr}  {item['score']}")
+        highscore_lines['key'] = key
+        highscore_lines['lines'] = lines
+    return highscore_lines['lines']
+
+def display_highscores(surface, game):
+    hi_text = text_cache.render(font(150), "TOP 10 SCORE", WHITE)
+    hi_rect = hi_text.get_rect( centerx = S(WIDTH//2), centery = S(HEIGHT//2 - 600) )
+    mark(surface.blit(hi_text, hi_rect))
+
+    y = HEIGHT//2 - 600 + 140
+    for sstr in highscore_table(game):
+        hi_text = text_cache.render(font(150), sstr, WHITE)
+        hi_rect = hi_text.get_rect(x=S(WIDTH // 2 - 400), centery=S(y))
+        mark(surface.blit(hi_text, hi_rect))
+        y += 140
+
+
+profile_overlay = { 'frame': None, 'surface': None }
+
+def display_profile(surface, prof):
+    # the numbers change every frame, the overlay is only rendered again
+    # twice a second so it does not cost more than what it measures
+    if profile_overlay['surface'] is None or prof.frames - profile_overlay['frame'] >= 30:
+        phases, counts = prof.summary()
+        small = pygame.font.Font(None, max(8, S(40)))
+        rows = [ ('', 'now', 'p99') ] + [ (phase, f"{now:.2f}", f"{p99:.2f}") for phase, now, p99 in phases ]
+        rows.append(('  '.join(f"{name} {n}" for name, n in counts.items()), '', ''))
+        line = small.get_linesize()
+        columns = (0, S(520), S(680))
+        overlay = pygame.Surface((S(700), line * len(rows)))
+        for i, row in enumerate(rows):
+            for n, (x, text) in enumerate(zip(columns, row)):
+                rendered = small.render(text, True, WHITE)
+                # the numbers are right aligned
+                overlay.blit(rendered, (x - rendered.get_width() if n else x, i * line))
+        profile_overlay['frame'] = prof.frames
+        profile_overlay['surface'] = overlay
+    overlay = profile_overlay['surface']
+    mark(surface.blit(overlay, (surface.get_width() - overlay.get_width() - S(20), S(20))))
+
+
+def draw_particles(surface, particles):
+    # particles fly in straight lines, one tick back is one step of dx, dy
+    back = 1 - blend.alpha if blend else 0
+    xs, ys = particles.dots(back)
+    if len(xs):
+        offset = DOT.get_width() // 2
+        dots = [ (DOT, (x * render_scale - offset, y * render_scale - offset)) for x, y in zip(xs.tolist(), ys.tolist()) ]
+        if dirty:
+            for rect in surface.blits(dots):
+                dirty.add(rect)
+        else:
+            surface.blits(dots, doreturn=False)
+    for x1, y1, x2, y2 in zip(*[ a.tolist() for a in particles.lines(back) ]):
+        start = (round(x1 * render_scale), round(y1 * render_scale))
+        end = (round(x2 * render_scale), round(y2 * render_scale))
+        mark(pygame.draw.line(surface, WHITE, start, end))
+
+
+def draw(game, window):
+    prof = profiler
+    if prof:
+        prof.begin()
+    # a window already the size frames are drawn at needs no scaled blit
+    surface = window if target is None or window.get_size() == target.get_size() else target
+    if dirty:
+        dirty.begin(surface)
+    else:
+        surface.fill((0, 0, 0))
+    for ast in game.asteroids:
+        if ast.asteroid_in_flight:
+            draw_actor(surface, ast.actor)
+    if prof:
+        prof.lap('draw_asteroids')
+    for bull in game.bullets:
+        draw_bullet(surface, bull)
+    if prof:
+        prof.lap('draw_bullets')
+    if not game.exploding_ship:
+        draw_actor(surface, game.ship.actor)
+    if prof:
+        prof.lap('draw_ship')
+    draw_particles(surface, game.particles)
+    if prof:
+        prof.lap('draw_particles')
+    for symbol in game.lives.symbols():
+        draw_actor(surface, symbol)
+    if prof:
+        prof.lap('draw_lives')
+    if game.ufo.in_flight:
+        draw_actor(surface, game.ufo.ufo)
+    draw_bullet(surface, game.ufo.bullet)
+    if prof:
+        prof.lap('draw_ufo')
+    display_score(surface, game)
+    if game.game_over and not game.show_highscore:
+        display_end(surface, game)
+    if game.get_highscore:
+        display_high_dialog(surface, game)
+    if game.show_highscore:
+        display_highscores(surface, game)
+    if prof:
+        prof.lap('draw_text')
+        if prof.visible:
+            display_profile(surface, prof)
+    if dirty:
+        # the scaled blit below repaints the whole window
+        dirty.end(whole_window = surface is not window)
+    if surface is not window:
+        pygame.transform.scale(target, window.get_size(), window)
+
+set_render_scale(1.0)
@@ -0,0 +1,87 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import time
+import game_core
+from game_core import Game, RESTART
+from journal import read_journal, held_keys
+
+# replays an input journal (journal.py) as fast as the game logic runs,
+# nothing is drawn unless frames are asked for:
+#
+#   python replay.py bug.journal
+#   python replay.py bug.journal --frames 1200-1260,5000 --out frames/
+
+
+def parse_frames(spec):
+    # "10,20-30" -> {10, 20, ..., 30}
+    frames = set()
+    for part in filter(None, spec.split(',')):
+        first, _, last = part.partition('-')
+        frames.update(range(int(first), int(last or first) + 1))
+    return frames
+
+def setup(header, render):
+    # hitboxes have to be computed like they were when recording
+    sprite = header['actor'] in ('sprite', 'mask')
+    if sprite:
+        os.environ['ASTEROIDS_ROTATION_STEPS'] = str(header['rotation_steps'])
+    if sprite or render:
+        import pygame
+        from pgzero import loaders
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        loaders.set_root(os.path.abspath(__file__))
+    if sprite:
+        from sprite_cache import CachedActor, sprites
+        sprites.load_atlas()
+        game_core.Actor = CachedActor
+    if header['actor'] == 'mask':
+        import collision_masks
+        game_core.segment_hit = collision_masks.segment_hit
+        game_core.actors_hit = collision_masks.actors_hit
+
+def replay(path, engine='python', frames=(), out='.'):
+    header, ticks = read_journal(path)
+    setup(header, bool(frames))
+    game = Game(engine=engine, seed=header['seed'])
+    if frames:
+        import pygame
+        import render
+        surface = pygame.Surface((game_core.WIDTH, game_core.HEIGHT))
+        os.makedirs(out, exist_ok=True)
+
+    games = 1
+    tick = 0
+    for i in range(0, len(ticks), 2):
+        held, events = ticks[i], ticks[i + 1]
+        if events & RESTART:
+            game.init()
+            games += 1
+            continue
+        game.key_events(events)
+        game.update(*held_keys(held))
+        if tick in frames:
+            render.draw(game, surface)
+            pygame.image.save(surface, os.path.join(out, f"frame-{tick:07d}.png"))
+        tick += 1
+    return game, tick, games
+
+def main():
+    parser = argparse.ArgumentParser(description='replay an input journal')
+    parser.add_argument('journal')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    parser.add_argument('--frames', default='', help='ticks to render as PNG, e.g. 100,200-250')
+    parser.add_argument('--out', default='.', help='directory for the rendered frames')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    game, ticks, games = replay(args.journal, args.engine, parse_frames(args.frames), args.out)
+    elapsed = time.perf_counter() - start
+    print(f"{ticks} ticks, {games} games, {elapsed:.2f}s, {ticks / elapsed:.0f} ticks/s")
+    print(f"score {game.score} level {game.level} lives {game.lives.lives} game over {game.game_over}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+INF = float('inf')
+
+# uniform grid broad-phase for the collision checks. objects are bucketed
+# by the cells their bounding rect covers; a query only looks at the
+# objects sharing a cell with the point or rect asked about. coordinates
+# outside the playfield are clamped to the border cells, so things
+# drifting in from off screen still end up in the same buckets.
+#
+# the grid is kept up to date instead of rebuilt: insert() again after an
+# item moved only compares its rect with the edges of the cells it is in,
+# and asteroids move a few pixels a tick on 250 pixel cells, so the
+# buckets are almost never touched.
+#
+# items inserted as solid also mark the cells they touch as occupied, and
+# free_cells() lists the ones nothing solid touches, e.g. where the ship can
+# teleport to without hitting an asteroid.
+
+
+class SpatialHash:
+    def __init__(self, width, height, cell_size=250):
+        self.cell_size = cell_size
+        self.cols = width // cell_size + 1
+        self.rows = height // cell_size + 1
+        self.cells = [ [] for _ in range(self.cols * self.rows) ]
+        # item -> [left_min, left_max, right_min, right_max, top_min, top_max,
+        #          bottom_min, bottom_max, cell indices, solid], the ranges
+        # its rect edges can move in without changing cells
+        self.items = {}
+        # solid items per cell
+        self.solid = [0] * (self.cols * self.rows)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def clear(self):
+        for entry in self.items.values():
+            for index in entry[8]:
+                self.cells[index].clear()
+                self.solid[index] = 0
+        self.items = {}
+
+    def _col(self, x):
+        return min(max(int(x // self.cell_size), 0), self.cols - 1)
+
+    def _row(self, y):
+        return min(max(int(y // self.cell_size), 0), self.rows - 1)
+
+    def _edges(self, i, last):
+        # the coordinates that fall in column or row i
+        size = self.cell_size
+        return (i * size if i else -INF), ((i + 1) * size if i < last else INF)
+
+    def insert(self, item, rect, solid=False):
+        # rect is anything with left/top/right/bottom, e.g. an Actor. an item
+        # that is in already is moved to where rect is now
+        entry = self.items.get(item)
+        left = rect.left
+        right = rect.right
+        top = rect.top
+        bottom = rect.bottom
+        if entry:
+            if (entry[0] <= left < entry[1] and entry[2] <= right < entry[3] and
+                    entry[4] <= top < entry[5] and entry[6] <= bottom < entry[7]):
+                return
+            self.remove(item)
+        col0, col1 = self._span(left, right, self.cols - 1)
+        row0, row1 = self._span(top, bottom, self.rows - 1)
+        indices = [ row * self.cols + col for row in range(row0, row1 + 1) for col in range(col0, col1 + 1) ]
+        for index in indices:
+            self.cells[index].append(item)
+            if solid:
+                self.solid[index] += 1
+        self.items[item] = [ *self._edges(col0, self.cols - 1), *self._edges(col1, self.cols - 1),
+                             *self._edges(row0, self.rows - 1), *self._edges(row1, self.rows - 1),
+                             indices, solid ]
+
+    def remove(self, item):
+        entry = self.items.pop(item, None)
+        if entry:
+            for index in entry[8]:
+                self.cells[index].remove(item)
+                if entry[9]:
+                    self.solid[index] -= 1
+
+    def query_point(self, x, y):
+        return self.cells[self._row(y) * self.cols + self._col(x)]
+
+    def _span(self, low, high, last):
+        # the columns or rows from low to high, clamped to the grid
+        size = self.cell_size
+        first = int(low // size)
+        end = int(high // size)
+        if first < 0:
+            first = 0
+        elif first > last:
+            first = last
+        if end < 0:
+            end = 0
+        elif end > last:
+            end = last
+        return first, end
+
+    def query_rect(self, rect):
+        left, right = self._span(rect.left, rect.right, self.cols - 1)
+        top, bottom = self._span(rect.top, rect.bottom, self.rows - 1)
+        if top == bottom and left == right:
+            # small rects mostly fit in one cell, nothing to merge
+            return self.cells[top * self.cols + left]
+        found = []
+        seen = set()
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                for item in self.cells[row * self.cols + col]:
+                    if id(item) not in seen:
+                        seen.add(id(item))
+                        found.append(item)
+        return found
+
+    def free_cells(self, width, height):
+        # cells lying wholly inside width x height that no solid item touches
+        return [ row * self.cols + col
+                 for row in range(height // self.cell_size)
+                 for col in range(width // self.cell_size)
+                 if not self.solid[row * self.cols + col] ]
+
+    def cell_origin(self, index):
+        row, col = divmod(index, self.cols)
+        return col * self.cell_size, row * self.cell_size
@@ -0,0 +1,89 @@
+import os
+import argparse
+import asyncio
+import struct
+import time
+import game_core
+from game_core import Game, WIDTH, HEIGHT
+from state_delta import StateDecoder
+from spectator_server import PORT
+
+# watches a game served by t.py (ASTEROIDS_SPECTATE) or headless.py
+# (--spectate), drawn with render.draw() like the game itself:
+#
+#   python spectator.py cabinet.local:8765
+#   python spectator.py localhost:8765 --headless --ticks 600 --frame last.png
+
+
+async def messages(reader):
+    while True:
+        length = await reader.readexactly(4)
+        yield length + await reader.readexactly(struct.unpack('<I', length)[0])
+
+def setup(headless, scale):
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    from pgzero import loaders
+    from sprite_cache import CachedActor, sprites
+    import render
+    pygame.init()
+    window = pygame.display.set_mode((int(WIDTH * scale), int(HEIGHT * scale)))
+    pygame.display.set_caption('asteroids spectator')
+    loaders.set_root(os.path.abspath(__file__))
+    sprites.load_atlas()
+    game_core.Actor = CachedActor
+    render.set_render_scale(scale)
+    return window
+
+async def watch(host, port, ticks=None, headless=False, scale=0.4, frame=None, fps=60):
+    window = setup(headless, scale)
+    import pygame
+    import render
+    decoder = StateDecoder(Game())
+    reader, writer = await asyncio.open_connection(host, port)
+    received = 0
+    shown = 0
+    next_draw = 0
+    start = time.perf_counter()
+    try:
+        async for message in messages(reader):
+            received += len(message)
+            if not decoder.apply(message):
+                continue
+            shown += 1
+            # ticks come in at the game's rate, frames are drawn at most at fps
+            now = time.perf_counter()
+            if now >= next_draw:
+                next_draw = now + 1 / fps
+                render.draw(decoder.game, window)
+                pygame.display.flip()
+                if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                    break
+            if ticks and shown >= ticks:
+                break
+    except asyncio.IncompleteReadError:
+        print("the server closed the connection")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    if frame:
+        render.draw(decoder.game, window)
+        pygame.image.save(window, frame)
+    print(f"{shown} ticks, {received} bytes, {received * 8 / 1000 / elapsed:.1f} kbit/s")
+    return decoder.game
+
+def main():
+    parser = argparse.ArgumentParser(description='watch a game served with ASTEROIDS_SPECTATE')
+    parser.add_argument('server', help=f'host[:port], the port defaults to {PORT}')
+    parser.add_argument('--scale', type=float, default=0.4, help='of the 2500x2000 playfield')
+    parser.add_argument('--headless', action='store_true', help='no window')
+    parser.add_argument('--ticks', type=int, default=None, help='stop after this many ticks')
+    parser.add_argument('--frame', help='save the last frame as an image')
+    args = parser.parse_args()
+
+    host, _, port = args.server.partition(':')
+    asyncio.run(watch(host, int(port or PORT), args.ticks, args.headless, args.scale, args.frame))
+
+if __name__ == '__main__':
+    main()
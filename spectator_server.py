@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from state_delta import StateEncoder
+
+# streams a running game to spectators over TCP (state_delta.py messages,
+# watched with spectator.py). the game thread calls publish() after every
+# tick. the message is encoded once and written to every client by an
+# asyncio loop in a thread of its own, so a spectator costs a socket write
+# per tick and nothing more.
+#
+# a client that joins gets the last keyframe and the deltas since, and is
+# live from there. one that stops reading is skipped once max_buffered
+# bytes are waiting for it, until it has caught up and a keyframe comes.
+
+PORT = 8765
+
+
+class SpectatorServer:
+    def __init__(self, host='0.0.0.0', port=PORT, keyframe_every=120, max_buffered=1 << 18):
+        self.host = host
+        self.port = port
+        self.max_buffered = max_buffered
+        self.encoder = StateEncoder(keyframe_every)
+        self.loop = None
+        self.server = None
+        self.clients = set()
+        self.lagging = set()
+        # the last keyframe and the deltas after it, for clients joining
+        self.backlog = []
+
+    def start(self):
+        # serves in a background thread, returns once it is listening
+        ready = threading.Event()
+        threading.Thread(target=self.run, args=(ready,), daemon=True).start()
+        ready.wait()
+        return self
+
+    def run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.join, self.host, self.port))
+        # port 0 picks a free one
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    def publish(self, game):
+        message, keyframe = self.encoder.encode(game)
+        self.loop.call_soon_threadsafe(self.broadcast, message, keyframe)
+
+    def broadcast(self, message, keyframe):
+        if keyframe:
+            self.backlog = [ message ]
+        else:
+            self.backlog.append(message)
+        for writer in self.clients:
+            buffered = writer.transport.get_write_buffer_size()
+            if writer in self.lagging:
+                # the deltas it missed are not sent, it starts over at a keyframe
+                if not keyframe or buffered > self.max_buffered:
+                    continue
+                self.lagging.discard(writer)
+            elif buffered > self.max_buffered:
+                self.lagging.add(writer)
+                continue
+            writer.write(message)
+
+    async def join(self, reader, writer):
+        for message in self.backlog:
+            writer.write(message)
+        self.clients.add(writer)
+        try:
+            # spectators send nothing, this only notices them leaving
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.lagging.discard(writer)
+            writer.close()
+
+    def close(self):
+        def stop():
+            self.server.close()
+            for writer in self.clients:
+                writer.close()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(stop)
@@ -0,0 +1,138 @@
+import json
+import mmap
+import os
+import threading
+import pygame
+from pgzero import loaders
+from pgzhelper import Actor
+
+# every change of Actor.angle, .scale or .image normally runs a new
+# scale/rotate of the source image. here the transformed surfaces are kept
+# per (image, scale, quantized angle) and shared by all actors, so turning
+# the ship or spawning an asteroid is a dict lookup once the surface exists.
+
+ROTATION_STEPS = int(os.environ.get('ASTEROIDS_ROTATION_STEPS', '360'))
+
+# the sprites the game draws: (image, scale, turns). build_atlas.py bakes
+# these, every rotation of the ones that turn, into images/sprites.atlas
+SPRITES = [
+    ('asteroid-a', 0.6, False),
+    ('asteroid-b', 0.3, False),
+    ('asteroid-c', 0.2, False),
+    ('ship', 2.0, True),
+    ('ship-flame', 2.0, True),
+    ('ship', 2.5, False),
+    ('ufo', 2.5, False),
+]
+ATLAS = os.environ.get('ASTEROIDS_ATLAS', 'images/sprites.atlas')
+
+
+class SpriteCache:
+    def __init__(self, steps=ROTATION_STEPS):
+        self.steps = steps
+        self.surfaces = {}
+
+    def quantize(self, angle):
+        step = 360 / self.steps
+        return round(angle / step) % self.steps * step
+
+    def get(self, image, scale, angle):
+        angle = self.quantize(angle)
+        key = (image, scale, angle)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if angle:
+                surface = pygame.transform.rotate(self.get(image, scale, 0), angle)
+            else:
+                surface = loaders.images.load(image)
+                if scale != 1:
+                    w, h = surface.get_size()
+                    surface = pygame.transform.scale(surface, (int(w * scale), int(h * scale)))
+            self.surfaces[key] = surface
+        return surface
+
+    def load_atlas(self, path=ATLAS):
+        # the pixels are stored in the byte order of a 32 bit display, so the
+        # file is just mapped into memory: no decoding, no conversion, and
+        # every frame is a subsurface of the one atlas surface. returns False
+        # when there is no atlas, the sprites are then made when first needed
+        try:
+            with open(path + '.json') as f:
+                index = json.load(f)
+            with open(path, 'rb') as f:
+                pixels = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return False
+        atlas = pygame.image.frombuffer(pixels, index['size'], index['format'])
+        display = pygame.display.get_surface()
+        if display and display.get_masks()[:3] != atlas.get_masks()[:3]:
+            atlas = atlas.convert_alpha()
+        self.atlas = atlas
+        for image, scale, angle, x, y, w, h in index['frames']:
+            self.surfaces[(image, scale, angle)] = atlas.subsurface((x, y, w, h))
+        return True
+
+    def prewarm(self, image, scale):
+        for i in range(self.steps):
+            self.get(image, scale, i * 360 / self.steps)
+
+sprites = SpriteCache()
+
+def preload(needed):
+    # (image, scale) pairs, loaded into the cache on a background thread
+    def load():
+        for image, scale in needed:
+            sprites.get(image, scale, 0)
+    threading.Thread(target=load, name='sprite-preload', daemon=True).start()
+
+
+class CachedActor(Actor):
+    # Actor whose surface comes from the shared cache. all actors in the
+    # game are anchored at their center, which stays the center of the
+    # rotated surface.
+    _scale = 1.0
+
+    def _update_surf(self):
+        p = self.pos
+        self._surf = sprites.get(self._image_name, self._scale, self._angle)
+        self.width, self.height = self._surf.get_size()
+        self._anchor = (self.width / 2, self.height / 2)
+        self.pos = p
+
+    @property
+    def _orig_surf(self):
+        # only decoded if something asks for the unscaled image, the frames
+        # themselves come from the cache or the atlas
+        return loaders.images.load(self._image_name)
+
+    @_orig_surf.setter
+    def _orig_surf(self, surf):
+        pass
+
+    @property
+    def image(self):
+        return self._image_name
+
+    @image.setter
+    def image(self, image):
+        self._image_name = image
+        self._update_surf()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, scale):
+        if scale != self._scale:
+            self._scale = scale
+            self._update_surf()
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle):
+        self._angle = angle
+        self._update_surf()
@@ -0,0 +1,33 @@
+import os
+import time
+
+# time to first frame, broken down by phase. t.py calls mark() after each
+# step of its startup and first_frame() from the first draw(). the report is
+# printed with ASTEROIDS_STARTUP_REPORT=1.
+
+REPORT = os.environ.get('ASTEROIDS_STARTUP_REPORT', '0') == '1'
+
+start = time.perf_counter()
+last = start
+phases = []
+done = False
+
+def mark(name):
+    global last
+    now = time.perf_counter()
+    phases.append((name, now - last))
+    last = now
+
+def first_frame():
+    global done
+    if done:
+        return
+    done = True
+    mark('window and first frame')
+    if REPORT:
+        print(report())
+
+def report():
+    lines = [ f"{name:28} {seconds * 1000:8.1f} ms" for name, seconds in phases ]
+    lines.append(f"{'time to first frame':28} {(last - start) * 1000:8.1f} ms")
+    return '\n'.join(lines)
@@ -0,0 +1,353 @@
+import struct
+import numpy as np
+from leaderboard import Leaderboard
+
+# what a spectator sees of a game as a stream of binary messages, one per
+# tick (spectator_server.py, spectator.py). a keyframe carries everything,
+# a delta only what changed since the message before it:
+#
+#   length u32, kind u8, tick u32, sections u16
+#
+# then the sections whose bit is set, in bit order. positions are in 1/8
+# pixels, int16. asteroids get an id when they appear and both ends keep
+# them in the same order, so their moves are sent as a block of int8 pairs
+# in that order, a jump too big for that (a respawn) is sent as a position.
+
+KEYFRAME = 1
+DELTA = 2
+
+HEAD = struct.Struct('<IBIH')
+
+SCORE = 1 << 0         # score u32
+LIVES = 1 << 1         # lives i8, level u8
+STATE = 1 << 2         # the STATE_ bits below, u8
+SHIP = 1 << 3          # x, y, angle in 1/100 degrees u16, flame u8
+UFO = 1 << 4           # in flight u8, x, y
+BULLETS = 1 << 5       # mask u16 of bullets in flight (bit 10 the ufo's), x, y of those
+ASTEROIDS = 1 << 6     # counts u16 of removed, added, jumped; removed ids u16;
+                       # added id u16, size u8, x, y; jumped id u16, x, y; moves
+PARTICLES = 1 << 7     # count u16, new particles: slot u16, x, y, dx, dy, hx, hy f32,
+                       # lifetime u16, line u8
+INITIALS = 1 << 8      # length u8, ascii
+TABLE = 1 << 9         # count u8, per entry length u8, ascii, score u32
+
+STATE_GAME_OVER = 1
+STATE_GET_HIGHSCORE = 2
+STATE_SHOW_HIGHSCORE = 4
+STATE_EXPLODING = 8
+
+SIZES = [ 'big', 'medium', 'small' ]
+
+# never equal to a value sent
+NOTHING = object()
+
+LIVES_LEVEL = struct.Struct('<bB')
+SHIP_POSE = struct.Struct('<hhHB')
+UFO_POSE = struct.Struct('<Bhh')
+COUNTS = struct.Struct('<HHH')
+ADDED = struct.Struct('<HBhh')
+JUMPED = struct.Struct('<Hhh')
+PARTICLE = struct.Struct('<HffffffHB')
+
+
+def fixed(value):
+    # 1/8 pixels, clamped to int16
+    return min(max(int(round(value * 8)), -32768), 32767)
+
+def text(value):
+    data = value.encode('ascii', 'replace')[:255]
+    return bytes((len(data),)) + data
+
+
+class StateEncoder:
+    # runs once per tick on the server, the same message goes to every client
+    def __init__(self, keyframe_every=120):
+        self.keyframe_every = keyframe_every
+        self.tick = 0
+        self.restarts = None
+        self.since_keyframe = 0
+        self.sent = {}
+        # live asteroid -> [id, x, y] as last sent, in the order of the ids
+        self.asteroids = {}
+        self.next_id = 0
+        self.particles_next = 0
+
+    def encode(self, game):
+        # the message for the tick that just ran and whether it is a keyframe.
+        # a new game (Game.init()) starts over with a keyframe too
+        keyframe = game.restarts != self.restarts or self.since_keyframe >= self.keyframe_every
+        if keyframe:
+            self.restarts = game.restarts
+            self.since_keyframe = 0
+            self.sent = {}
+            self.asteroids = {}
+        self.since_keyframe += 1
+        self.tick += 1
+
+        sections = 0
+        parts = []
+
+        if self.changed(SCORE, game.score):
+            sections |= SCORE
+            parts.append(struct.pack('<I', game.score))
+        lives = (max(-128, min(game.lives.lives, 127)), min(game.level, 255))
+        if self.changed(LIVES, lives):
+            sections |= LIVES
+            parts.append(LIVES_LEVEL.pack(*lives))
+        state = ((STATE_GAME_OVER if game.game_over else 0) |
+                 (STATE_GET_HIGHSCORE if game.get_highscore else 0) |
+                 (STATE_SHOW_HIGHSCORE if game.show_highscore else 0) |
+                 (STATE_EXPLODING if game.exploding_ship else 0))
+        if self.changed(STATE, state):
+            sections |= STATE
+            parts.append(bytes((state,)))
+
+        actor = game.ship.actor
+        ship = (fixed(actor.x), fixed(actor.y), int(round(actor.angle % 360 * 100)) % 36000,
+                actor.image == 'ship-flame')
+        if self.changed(SHIP, ship):
+            sections |= SHIP
+            parts.append(SHIP_POSE.pack(*ship))
+
+        ufo = game.ufo
+        pose = (1, fixed(ufo.ufo.x), fixed(ufo.ufo.y)) if ufo.in_flight else (0, 0, 0)
+        if self.changed(UFO, pose):
+            sections |= UFO
+            parts.append(UFO_POSE.pack(*pose))
+
+        bullets = [ (fixed(b.bullet_x), fixed(b.bullet_y)) if b.bullet_in_flight else None
+                    for b in game.bullets + [ ufo.bullet ] ]
+        if self.changed(BULLETS, bullets):
+            sections |= BULLETS
+            mask = 0
+            positions = []
+            for i, position in enumerate(bullets):
+                if position:
+                    mask |= 1 << i
+                    positions += position
+            parts.append(struct.pack(f'<H{len(positions)}h', mask, *positions))
+
+        data = self.encode_asteroids(game)
+        if data:
+            sections |= ASTEROIDS
+            parts.append(data)
+
+        data = self.encode_particles(game.particles, keyframe)
+        if data:
+            sections |= PARTICLES
+            parts.append(data)
+
+        if self.changed(INITIALS, game.initials):
+            sections |= INITIALS
+            parts.append(text(game.initials))
+        # the table is only shown after game over
+        if game.game_over:
+            table = tuple((item['initials'], item['score']) for item in game.highscores)
+            if self.changed(TABLE, table):
+                sections |= TABLE
+                parts.append(bytes((len(table),)))
+                for initials, score in table:
+                    parts.append(text(initials) + struct.pack('<I', score))
+
+        body = b''.join(parts)
+        head = HEAD.pack(HEAD.size - 4 + len(body), KEYFRAME if keyframe else DELTA, self.tick, sections)
+        return head + body, keyframe
+
+    def changed(self, section, value):
+        if self.sent.get(section, NOTHING) == value:
+            return False
+        self.sent[section] = value
+        return True
+
+    def encode_asteroids(self, game):
+        sent = self.asteroids
+        live = game.asteroids.live
+        if not live and not sent:
+            return None
+        present = set(live)
+        removed = [ ast for ast in sent if ast not in present ]
+        added = [ ast for ast in live if ast not in sent ]
+        parts = []
+        for ast in removed:
+            parts.append(struct.pack('<H', sent.pop(ast)[0]))
+        for ast in added:
+            x, y = fixed(ast.actor.x), fixed(ast.actor.y)
+            sent[ast] = [ self.next_id, x, y ]
+            parts.append(ADDED.pack(self.next_id, SIZES.index(ast.size), x, y))
+            self.next_id = (self.next_id + 1) & 0xffff
+        jumped = []
+        moves = bytearray()
+        for ast, entry in sent.items():
+            x, y = fixed(ast.actor.x), fixed(ast.actor.y)
+            dx = x - entry[1]
+            dy = y - entry[2]
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                moves += struct.pack('<bb', dx, dy)
+            else:
+                moves += b'\0\0'
+                jumped.append(JUMPED.pack(entry[0], x, y))
+            entry[1] = x
+            entry[2] = y
+        if not removed and not added and not jumped and not any(moves):
+            return None
+        return COUNTS.pack(len(removed), len(added), len(jumped)) + b''.join(parts) + b''.join(jumped) + bytes(moves)
+
+    def encode_particles(self, particles, keyframe):
+        # the whole ring on a keyframe, otherwise the slots written since
+        # the last message. both ends move them on by themselves
+        capacity = particles.capacity
+        if keyframe:
+            slots = np.flatnonzero(particles.lifetime > 0)
+        else:
+            count = (particles.next - self.particles_next) % capacity
+            slots = (self.particles_next + np.arange(count)) % capacity
+        self.particles_next = particles.next
+        if not len(slots):
+            return None
+        records = [ PARTICLE.pack(*record) for record in zip(
+            slots.tolist(), particles.x[slots].tolist(), particles.y[slots].tolist(),
+            particles.dx[slots].tolist(), particles.dy[slots].tolist(),
+            particles.hx[slots].tolist(), particles.hy[slots].tolist(),
+            np.clip(particles.lifetime[slots], 0, 65535).tolist(), particles.line[slots].tolist()) ]
+        return struct.pack('<H', len(records)) + b''.join(records)
+
+
+class StateDecoder:
+    # applies the messages to a Game that is only drawn, never updated
+    def __init__(self, game):
+        self.game = game
+        # id -> [asteroid, x, y], in the order of the encoder
+        self.asteroids = {}
+        self.tick = None
+        self.synced = False
+
+    def apply(self, message):
+        # a whole message, length included. False while waiting for a keyframe
+        _, kind, tick, sections = HEAD.unpack_from(message)
+        game = self.game
+        if kind == KEYFRAME:
+            self.reset()
+        elif not self.synced:
+            return False
+        else:
+            game.particles.update()
+        self.tick = tick
+        offset = HEAD.size
+
+        if sections & SCORE:
+            game.score, = struct.unpack_from('<I', message, offset)
+            offset += 4
+        if sections & LIVES:
+            game.lives.lives, game.level = LIVES_LEVEL.unpack_from(message, offset)
+            offset += LIVES_LEVEL.size
+        if sections & STATE:
+            state = message[offset]
+            offset += 1
+            game.game_over = bool(state & STATE_GAME_OVER)
+            game.get_highscore = bool(state & STATE_GET_HIGHSCORE)
+            game.show_highscore = bool(state & STATE_SHOW_HIGHSCORE)
+            # only ever tested for being there by render.draw()
+            game.exploding_ship = True if state & STATE_EXPLODING else None
+        if sections & SHIP:
+            x, y, angle, flame = SHIP_POSE.unpack_from(message, offset)
+            offset += SHIP_POSE.size
+            actor = game.ship.actor
+            image = 'ship-flame' if flame else 'ship'
+            if actor.image != image:
+                actor.image = image
+                actor.scale = 2.0
+            actor.angle = angle / 100
+            actor.pos = (x / 8, y / 8)
+        if sections & UFO:
+            in_flight, x, y = UFO_POSE.unpack_from(message, offset)
+            offset += UFO_POSE.size
+            game.ufo.in_flight = bool(in_flight)
+            if in_flight:
+                game.ufo.ufo.pos = (x / 8, y / 8)
+        if sections & BULLETS:
+            mask, = struct.unpack_from('<H', message, offset)
+            offset += 2
+            for i, bullet in enumerate(game.bullets + [ game.ufo.bullet ]):
+                bullet.bullet_in_flight = bool(mask & (1 << i))
+                if bullet.bullet_in_flight:
+                    x, y = struct.unpack_from('<hh', message, offset)
+                    offset += 4
+                    bullet.bullet_x = x / 8
+                    bullet.bullet_y = y / 8
+        if sections & ASTEROIDS:
+            offset = self.apply_asteroids(message, offset)
+        if sections & PARTICLES:
+            offset = self.apply_particles(message, offset)
+        if sections & INITIALS:
+            n = message[offset]
+            game.initials = bytes(message[offset + 1:offset + 1 + n]).decode('ascii')
+            offset += 1 + n
+        if sections & TABLE:
+            entries = []
+            for _ in range(message[offset]):
+                offset += 1
+                n = message[offset]
+                initials = bytes(message[offset + 1:offset + 1 + n]).decode('ascii')
+                score, = struct.unpack_from('<I', message, offset + 1 + n)
+                offset += n + 4
+                entries.append({ 'initials': initials, 'score': score })
+            game.highscores = Leaderboard(entries)
+        return True
+
+    def reset(self):
+        game = self.game
+        game.asteroids.clear()
+        self.asteroids = {}
+        game.particles.clear()
+        game.exploding_ship = None
+        game.ufo.in_flight = False
+        for bullet in game.bullets + [ game.ufo.bullet ]:
+            bullet.bullet_in_flight = False
+        self.synced = True
+
+    def apply_asteroids(self, message, offset):
+        pool = self.game.asteroids
+        removed, added, jumped = COUNTS.unpack_from(message, offset)
+        offset += COUNTS.size
+        for _ in range(removed):
+            id, = struct.unpack_from('<H', message, offset)
+            offset += 2
+            pool.kill(self.asteroids.pop(id)[0])
+        for _ in range(added):
+            id, size, x, y = ADDED.unpack_from(message, offset)
+            offset += ADDED.size
+            self.asteroids[id] = [ pool.spawn(x / 8, y / 8, 0, SIZES[size]), x, y ]
+        jumps = {}
+        for _ in range(jumped):
+            id, x, y = JUMPED.unpack_from(message, offset)
+            offset += JUMPED.size
+            jumps[id] = (x, y)
+        moves = struct.unpack_from(f'<{len(self.asteroids) * 2}b', message, offset)
+        offset += len(moves)
+        for i, (id, entry) in enumerate(self.asteroids.items()):
+            if id in jumps:
+                entry[1], entry[2] = jumps[id]
+            else:
+                entry[1] += moves[i * 2]
+                entry[2] += moves[i * 2 + 1]
+            entry[0].actor.pos = (entry[1] / 8, entry[2] / 8)
+        return offset
+
+    def apply_particles(self, message, offset):
+        particles = self.game.particles
+        count, = struct.unpack_from('<H', message, offset)
+        offset += 2
+        busy = particles.busy
+        for slot, x, y, dx, dy, hx, hy, lifetime, line in PARTICLE.iter_unpack(
+                message[offset:offset + count * PARTICLE.size]):
+            particles.x[slot] = x
+            particles.y[slot] = y
+            particles.dx[slot] = dx
+            particles.dy[slot] = dy
+            particles.hx[slot] = hx
+            particles.hy[slot] = hy
+            particles.lifetime[slot] = lifetime
+            particles.line[slot] = line
+            busy = max(busy, lifetime)
+        particles.busy = busy
+        return offset + count * PARTICLE.size
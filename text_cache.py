@@ -0,0 +1,46 @@
+import pygame
+from collections import OrderedDict
+
+# rendering text with the big fonts is one of the most expensive calls in a
+# frame, and almost all of it is the same from one frame to the next.
+
+
+class TextCache:
+    # surfaces keyed by (font, string, color), least recently used go first
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class DigitAtlas:
+    # '0'-'9' rendered once, a number is put together from those glyphs when
+    # it changes instead of going through the font renderer again
+    def __init__(self, font, color):
+        self.glyphs = { d: font.render(d, True, color) for d in '0123456789' }
+        self.height = max(g.get_height() for g in self.glyphs.values())
+        self.text = None
+        self.surface = None
+
+    def render(self, text):
+        if text != self.text:
+            glyphs = [ self.glyphs[ch] for ch in text ]
+            surface = pygame.Surface((sum(g.get_width() for g in glyphs), self.height), pygame.SRCALPHA)
+            x = 0
+            for g in glyphs:
+                surface.blit(g, (x, 0))
+                x += g.get_width()
+            self.text = text
+            self.surface = surface
+        return self.surface
@@ -0,0 +1,207 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from game_core import WIDTH, HEIGHT
+from headless import Simulation, Inputs
+
+# N independent games for training and evaluating bots. the games are split
+# in shards, each stepped in batch by a worker process, and the actions,
+# observations, rewards and done flags are numpy arrays in shared memory, so
+# a step sends a few bytes per worker over a pipe and pickles nothing else.
+#
+#   env = VecEnv(64)
+#   obs = env.reset()
+#   while True:
+#       obs, rewards, dones = env.step(policy(obs))
+#
+# an action is a bit mask of the keys held down / pressed during the tick:
+THRUST = 1
+LEFT = 2
+RIGHT = 4
+FIRE = 8
+TELEPORT = 16
+ACTIONS = [ Inputs(thrust=bool(a & THRUST), left=bool(a & LEFT), right=bool(a & RIGHT),
+                   fire=bool(a & FIRE), teleport=bool(a & TELEPORT)) for a in range(32) ]
+
+# the observation of one game, float32, coordinates scaled to 0..1:
+#   ship x, y, dx, dy, angle / 360, rotate_speed, lives, level
+#   ufo in flight, x, y, ufo bullet in flight, x, y
+#   10 bullets: in flight, x, y
+#   MAX_ASTEROIDS asteroids: alive, x, y, size (1 big, 2 medium, 3 small)
+MAX_ASTEROIDS = 32
+SHIP = 8
+UFO = 6
+BULLETS = 10 * 3
+OBS_SIZE = SHIP + UFO + BULLETS + MAX_ASTEROIDS * 4
+SIZES = { 'big': 1, 'medium': 2, 'small': 3 }
+
+
+def observe(game, out):
+    ship = game.ship
+    ufo = game.ufo
+    row = [ ship.x / WIDTH, ship.y / HEIGHT, ship.dx, ship.dy, ship.angle / 360, game.rotate_speed,
+            game.lives.lives, game.level,
+            ufo.in_flight, ufo.x / WIDTH, ufo.y / HEIGHT,
+            ufo.bullet.bullet_in_flight, ufo.bullet.bullet_x / WIDTH, ufo.bullet.bullet_y / HEIGHT ]
+    for bull in game.bullets:
+        row += (bull.bullet_in_flight, bull.bullet_x / WIDTH, bull.bullet_y / HEIGHT)
+    n = 0
+    for ast in game.asteroids:
+        if n == MAX_ASTEROIDS:
+            break
+        row += (1, ast.asteroid_x / WIDTH, ast.asteroid_y / HEIGHT, SIZES[ast.size])
+        n += 1
+    out[:len(row)] = row
+    out[len(row):] = 0
+
+
+class Shard:
+    # the games [start, stop) of a VecEnv, stepped one after the other
+    def __init__(self, arrays, start, stop, seed, engine):
+        self.actions, self.obs, self.rewards, self.dones = arrays
+        self.start = start
+        self.sims = [ Simulation(engine=engine, seed=seed + i) for i in range(start, stop) ]
+
+    def reset(self):
+        for i, sim in enumerate(self.sims, self.start):
+            sim.reset()
+            observe(sim.game, self.obs[i])
+            self.rewards[i] = 0
+            self.dones[i] = False
+
+    def step(self, frame_skip):
+        # reward is the score gained, a finished game is reset right away
+        # and its observation is the first one of the next game
+        for i, sim in enumerate(self.sims, self.start):
+            inputs = ACTIONS[self.actions[i] & 31]
+            game = sim.game
+            score = game.score
+            done = False
+            for _ in range(frame_skip):
+                if sim.step(inputs):
+                    done = True
+                    break
+            self.rewards[i] = game.score - score
+            self.dones[i] = done
+            if done:
+                sim.reset()
+            observe(game, self.obs[i])
+
+
+def shared_arrays(memory, n):
+    # actions, observations, rewards, dones laid out in one shared block
+    actions = np.ndarray((n,), np.uint8, memory.buf, 0)
+    offset = -(-n // 8) * 8
+    obs = np.ndarray((n, OBS_SIZE), np.float32, memory.buf, offset)
+    offset += obs.nbytes
+    rewards = np.ndarray((n,), np.float32, memory.buf, offset)
+    offset += rewards.nbytes
+    dones = np.ndarray((n,), np.bool_, memory.buf, offset)
+    return actions, obs, rewards, dones
+
+def shared_size(n):
+    return -(-n // 8) * 8 + n * OBS_SIZE * 4 + n * 4 + n
+
+def worker(name, n, start, stop, seed, engine, conn):
+    memory = SharedMemory(name)
+    arrays = shared_arrays(memory, n)
+    shard = Shard(arrays, start, stop, seed, engine)
+    while True:
+        command, arg = conn.recv()
+        if command == 'step':
+            shard.step(arg)
+        elif command == 'reset':
+            shard.reset()
+        elif command == 'close':
+            break
+        conn.send(None)
+    del arrays, shard
+    memory.close()
+
+
+class VecEnv:
+    def __init__(self, n, workers=None, seed=0, engine='python', frame_skip=1):
+        # workers=0 steps all games in this process
+        if workers is None:
+            workers = min(n, os.cpu_count() or 1)
+        self.n = n
+        self.frame_skip = frame_skip
+        self.memory = SharedMemory(create=True, size=shared_size(n))
+        self.actions, self.obs, self.rewards, self.dones = shared_arrays(self.memory, n)
+        self.pipes = []
+        self.processes = []
+        self.local = None
+        if workers == 0:
+            self.local = Shard((self.actions, self.obs, self.rewards, self.dones), 0, n, seed, engine)
+            return
+        bounds = np.linspace(0, n, workers + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = mp.Pipe()
+            p = mp.Process(target=worker, args=(self.memory.name, n, start, stop, seed, engine, child), daemon=True)
+            p.start()
+            self.pipes.append(parent)
+            self.processes.append(p)
+
+    def call(self, command, arg=None):
+        # all workers run the command at the same time, returns when all are done
+        for conn in self.pipes:
+            conn.send((command, arg))
+        for conn in self.pipes:
+            conn.recv()
+
+    def reset(self):
+        if self.local:
+            self.local.reset()
+        else:
+            self.call('reset')
+        return self.obs
+
+    def step(self, actions):
+        # the returned arrays are overwritten by the next step, copy what
+        # has to be kept
+        self.actions[:] = actions
+        if self.local:
+            self.local.step(self.frame_skip)
+        else:
+            self.call('step', self.frame_skip)
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for conn in self.pipes:
+            conn.send(('close', None))
+        for p in self.processes:
+            p.join()
+        self.pipes = []
+        self.processes = []
+        self.local = None
+        del self.actions, self.obs, self.rewards, self.dones
+        self.memory.close()
+        self.memory.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='throughput of the vectorized environment')
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    args = parser.parse_args()
+
+    env = VecEnv(args.envs, args.workers, engine=args.engine, frame_skip=args.frame_skip)
+    workers = len(env.processes)
+    rng = np.random.default_rng(0)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        env.step(rng.integers(0, 32, args.envs, dtype=np.uint8) & (31 ^ TELEPORT))
+    elapsed = time.perf_counter() - start
+    env.close()
+    ticks = args.envs * args.steps * args.frame_skip
+    print(f"{args.envs} games, {workers} worker processes: {ticks / elapsed:.0f} ticks/s")
+
+if __name__ == '__main__':
+    main()